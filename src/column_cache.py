@@ -0,0 +1,404 @@
+"""
+Module to cache decoded columns on disk, next to the files they came from
+"""
+import io
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+
+# Relative imports
+from .lib import get_filesize
+
+# Name of the cache directory created next to decoded files.
+CACHE_DIRNAME = ".decoder_ring_cache"
+
+# Maximum total size of a cache directory, in bytes, before entries are evicted.
+MAX_CACHE_BYTES = 2 ** 30
+
+# Number of bytes hashed from each of the start, middle and end of a file.
+FINGERPRINT_BYTES = 2 ** 16
+
+# Version of the cache layout; bump to invalidate every existing entry.
+CACHE_VERSION = 2
+
+# File, in each entry, describing its columns and the source file.
+META_FILENAME = "meta.json"
+
+
+def get_cache_dir(filepath, cache_root=None):
+    """Returns the cache directory for `filepath`.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the decoded file.
+    cache_root : str, optional
+        Directory holding the cache.  Defaults to `CACHE_DIRNAME` next to
+        `filepath`.
+
+    Returns
+    -------
+    cache_dir : str
+    """
+    if cache_root is not None:
+        return cache_root
+
+    return os.path.join(os.path.dirname(os.path.abspath(filepath)), CACHE_DIRNAME)
+
+
+def get_file_signature(filepath):
+    """Returns the size, modification time and a content fingerprint of a file.
+
+    The fingerprint hashes `FINGERPRINT_BYTES` from the start, middle and end of
+    the file, so it is cheap for any size of file, and catches rewrites which
+    preserve the size and modification time.
+
+    Returns
+    -------
+    signature : dict
+    """
+    size = get_filesize(filepath)
+
+    fingerprint = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for offset in sorted({0, max(size // 2 - FINGERPRINT_BYTES // 2, 0),
+                max(size - FINGERPRINT_BYTES, 0)}):
+            f.seek(offset)
+            fingerprint.update(f.read(FINGERPRINT_BYTES))
+
+    return {
+        "size": size,
+        "mtime_ns": os.stat(filepath).st_mtime_ns,
+        "fingerprint": fingerprint.hexdigest(),
+    }
+
+
+def get_schema_hash(knowns, packet_length):
+    """Returns a hash of the layout the columns were decoded with.
+
+    Parameters
+    ----------
+    knowns : dict
+        Portions of the byte map that are known.  See `DataDecoder`.
+    packet_length : int
+        Number of bytes in each packet.
+
+    Returns
+    -------
+    schema_hash : str
+    """
+    schema = {
+        "version": CACHE_VERSION,
+        "packet_length": packet_length,
+        "knowns": [[byte_idx, byte_dict["label"], byte_dict["dtype"],
+                byte_dict.get("factor", 1)] for byte_idx, byte_dict in
+                sorted(knowns.items())],
+    }
+
+    return hashlib.sha1(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_columns(filepath, knowns, packet_length, cache_root=None, nrows=None):
+    """Returns the cached columns of `filepath`, memory-mapped, if up to date.
+
+    An entry whose source file has changed is removed.  A hit marks the entry
+    as recently used.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the decoded file.
+    knowns : dict
+        Portions of the byte map that are known.  See `DataDecoder`.
+    packet_length : int
+        Number of bytes in each packet.
+    cache_root : str, optional
+        See `get_cache_dir`.
+    nrows : int, optional
+        Number of rows expected; an entry of any other number is a miss.
+
+    Returns
+    -------
+    columns : dict or None
+        Label to read-only, memory-mapped np.array.  None if not cached.
+    """
+    entry = _get_entry_dir(filepath, knowns, packet_length, cache_root)
+    meta = _read_meta(entry)
+
+    if (meta is None) or ((nrows is not None) and (meta.get("nrows") != nrows)):
+        return None
+
+    if meta["signature"] != get_file_signature(filepath):
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+    try:
+        columns = {label: np.load(os.path.join(entry, filename), mmap_mode="r")
+                for label, filename in meta["columns"]}
+    except (OSError, ValueError):
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+    _touch(entry)
+
+    return columns
+
+
+def save_columns(filepath, knowns, packet_length, columns, cache_root=None,
+        max_bytes=MAX_CACHE_BYTES, signature=None):
+    """Caches the decoded `columns` of `filepath`, then evicts old entries.
+
+    Entries of other schemas of `filepath` whose source has changed are
+    removed, and the least recently used entries are evicted until the cache
+    is at most `max_bytes`.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the decoded file.
+    knowns : dict
+        Portions of the byte map that are known.  See `DataDecoder`.
+    packet_length : int
+        Number of bytes in each packet.
+    columns : dict
+        Label to np.array of decoded values.
+    cache_root : str, optional
+        See `get_cache_dir`.
+    max_bytes : int
+        Maximum total size of the cache directory.
+    signature : dict, optional
+        Signature of `filepath` (see `get_file_signature`) taken before
+        decoding `columns`, so that an entry of a file which grew meanwhile is
+        never taken as up to date.  Defaults to the signature now.
+
+    Returns
+    -------
+    columns : dict
+        Label to read-only, memory-mapped np.array of the cached columns.
+    """
+    cache_dir = get_cache_dir(filepath, cache_root)
+    entry = _get_entry_dir(filepath, knowns, packet_length, cache_root)
+    if signature is None:
+        signature = get_file_signature(filepath)
+
+    # Write to a temporary directory, so readers never see a partial entry.
+    tmp = "{}.tmp-{}".format(entry, os.getpid())
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    meta = {
+        "source": os.path.abspath(filepath),
+        "signature": signature,
+        "nrows": len(next(iter(columns.values()))) if columns else 0,
+        "columns": [],
+    }
+    for i, (label, values) in enumerate(columns.items()):
+        filename = "col{}.npy".format(i)
+        np.save(os.path.join(tmp, filename), np.asarray(values))
+        meta["columns"].append((label, filename))
+
+    with open(os.path.join(tmp, META_FILENAME), "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(entry, ignore_errors=True)
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        # Another process cached the same entry first.
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    _remove_stale(cache_dir, meta["source"], signature)
+    evict(cache_dir, max_bytes, keep=entry)
+
+    return load_columns(filepath, knowns, packet_length, cache_root=cache_root,
+            nrows=meta["nrows"])
+
+
+def append_columns(filepath, knowns, packet_length, columns, start, cache_root=None,
+        max_bytes=MAX_CACHE_BYTES, signature=None):
+    """Appends rows `start` onwards of `columns` to the cached columns of `filepath`.
+
+    For files which grow by appending packets: the rows are appended to each
+    .npy file in place (rewriting its header), so the cost scales with the
+    rows appended, and the entry is re-signed with the grown file.  If the
+    entry does not hold exactly `start` rows, or a header no longer fits in
+    place, every column is saved instead (see `save_columns`).
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the decoded file.
+    knowns : dict
+        Portions of the byte map that are known.  See `DataDecoder`.
+    packet_length : int
+        Number of bytes in each packet.
+    columns : dict
+        Label to np.array of every decoded value (not only the new ones).
+    start : int
+        Number of rows already cached.
+    cache_root : str, optional
+        See `get_cache_dir`.
+    max_bytes : int
+        Maximum total size of the cache directory.
+    signature : dict, optional
+        See `save_columns`.
+    """
+    if signature is None:
+        signature = get_file_signature(filepath)
+
+    entry = _get_entry_dir(filepath, knowns, packet_length, cache_root)
+    meta = _read_meta(entry)
+
+    if (meta is None) or (meta.get("nrows") != start) or \
+            ([label for label, _ in meta["columns"]] != list(columns)) or \
+            not all(_append_npy(os.path.join(entry, filename), columns[label][start:])
+                for label, filename in meta["columns"]):
+        save_columns(filepath, knowns, packet_length, columns,
+                cache_root=cache_root, max_bytes=max_bytes, signature=signature)
+        return
+
+    meta["signature"] = signature
+    meta["nrows"] = len(next(iter(columns.values()))) if columns else 0
+    with open(os.path.join(entry, META_FILENAME), "w") as f:
+        json.dump(meta, f)
+
+    evict(get_cache_dir(filepath, cache_root), max_bytes, keep=entry)
+
+
+def evict(cache_dir, max_bytes=MAX_CACHE_BYTES, keep=None):
+    """Removes the least recently used entries until the cache fits `max_bytes`.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory holding the cache.
+    max_bytes : int
+        Maximum total size of the cache directory.
+    keep : str, optional
+        Entry directory never evicted (e.g. the one just written).
+
+    Returns
+    -------
+    evicted : list of str
+        Entry directories removed.
+    """
+    entries = []
+    for entry in _list_entries(cache_dir):
+        meta_path = os.path.join(entry, META_FILENAME)
+        size = sum(get_filesize(os.path.join(entry, filename)) for filename in
+                os.listdir(entry))
+        entries.append((os.stat(meta_path).st_mtime, entry, size))
+
+    total = sum(size for _, _, size in entries)
+
+    evicted = []
+    for _, entry, size in sorted(entries):
+        if total <= max_bytes:
+            break
+
+        if entry == keep:
+            continue
+
+        shutil.rmtree(entry, ignore_errors=True)
+        evicted.append(entry)
+        total -= size
+
+    return evicted
+
+
+def _append_npy(path, values):
+    """Appends `values` to the 1-d array in the .npy file at `path`.
+
+    Returns
+    -------
+    appended : bool
+        False (and the file unchanged) if the file does not hold a 1-d array
+        of the data-type of `values`, or its header can not be rewritten in
+        place.
+    """
+    values = np.ascontiguousarray(values)
+
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        else:
+            return False
+
+        header_length = f.tell()
+        if (len(shape) != 1) or fortran_order or (dtype != values.dtype):
+            return False
+
+        write_header = np.lib.format.write_array_header_2_0 if version == (2, 0) \
+            else np.lib.format.write_array_header_1_0
+
+        header = io.BytesIO()
+        write_header(header, {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (shape[0] + len(values),),
+        })
+
+        # Headers are padded, so the new shape nearly always fits in place.
+        if len(header.getvalue()) != header_length:
+            return False
+
+        f.seek(header_length + shape[0] * dtype.itemsize)
+        f.write(values.tobytes())
+        f.seek(0)
+        f.write(header.getvalue())
+
+    return True
+
+
+def _get_entry_dir(filepath, knowns, packet_length, cache_root=None):
+    """Returns the directory caching `filepath` decoded with a given schema."""
+    path_hash = hashlib.sha1(os.path.abspath(filepath).encode("utf-8")).hexdigest()
+
+    return os.path.join(
+        get_cache_dir(filepath, cache_root),
+        "{}-{}-{}".format(os.path.basename(filepath), path_hash[:8],
+            get_schema_hash(knowns, packet_length)[:12])
+    )
+
+
+def _list_entries(cache_dir):
+    """Returns the (complete) entry directories in `cache_dir`.
+
+    Entries still being written (see `save_columns`) are skipped.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    return [os.path.join(cache_dir, name) for name in sorted(os.listdir(cache_dir))
+            if os.path.isfile(os.path.join(cache_dir, name, META_FILENAME)) and
+            not name.rpartition(".tmp-")[2].isdigit()]
+
+
+def _read_meta(entry):
+    """Returns the metadata of a cache entry, or None if there is none."""
+    try:
+        with open(os.path.join(entry, META_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_stale(cache_dir, source, signature):
+    """Removes entries of `source` cached from a different version of it."""
+    for entry in _list_entries(cache_dir):
+        meta = _read_meta(entry)
+        if (meta is not None) and (meta["source"] == source) and \
+                (meta["signature"] != signature):
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def _touch(entry):
+    """Marks a cache entry as used now."""
+    now = time.time()
+    os.utime(os.path.join(entry, META_FILENAME), (now, now))
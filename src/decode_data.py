@@ -2,13 +2,22 @@
 Module to decode byte-stream
 """
 import os
+import mmap
+import asyncio
+import datetime
+import operator
+import concurrent.futures
 import pandas as pd
 import numpy as np
-from copy import deepcopy
+from collections import namedtuple
+from functools import lru_cache
 from warnings import warn
 
 # Relative imports
-from .lib import DATA_TYPES, DecoderRingError, cast_from_bytes, get_nbytes, get_filesize
+from .lib import (DATA_TYPES, DecoderRingError, cast_from_bytes, cast_offsets,
+        get_fields_dtype, get_nbytes, get_filesize, get_packet_dtype)
+from .packet_map import START_BYTES, parse_header_bytes
+from . import column_cache, field_stats, infer_data
 
 # Number of bytes in the packet
 PACKET_LENGTH = 21
@@ -35,35 +44,123 @@ KNOWNS = {
 
 DPT_INDEX = 1
 
+# Value of the first byte of each packet (i.e. hex "AA").
+START_BYTE = 170
+
+# Number of bytes searched for the end of the header.
+MAX_HEADER_BYTES = 4096
+
+# Number of bytes sampled when detecting the packet length.
+DETECT_SAMPLE_BYTES = 2 ** 20
+
+# Number of packets, from the end of the file, used to infer fields.
+INFER_PACKETS = 100000
+
+# Number of packets, from the end of the file, searched for the dpt and time
+# fields.
+DETECT_PACKETS = 100000
+
+# Supported ways of reading the file.  "file" reads packets into memory,
+# "mmap" maps the file once and serves packets as views over the mapping.
+BACKENDS = ("file", "mmap")
+
+# Default number of packets decoded at a time when streaming.
+CHUNK_PACKETS = 1000000
+
+# Seconds between checks of a followed file for appended packets.
+FOLLOW_INTERVAL = 0.1
+
+# Number of files decoded by each task dispatched by `decode_many`.
+DECODE_MANY_CHUNK = 16
+
+# Number of start bytes, one packet apart, confirming a resynchronization.
+RESYNC_CONFIRM = 3
+
+# Number of packets validated at a time when locating packets.
+RESYNC_BLOCK = 65536
+
+# Number of bytes searched at a time for the next valid start byte.
+RESYNC_WINDOW = 65536
+
 
 class DataDecoder(object):
     """Class for decoding a binary file."""
 
     def __init__(self, filepath, ndpts=4, dtypes=None, starting_bytes=None,
-            packet_length=PACKET_LENGTH, knowns=KNOWNS, dpt_index=DPT_INDEX):
-        """Initializes the DataDecoder object, including seeding the data."""
+            packet_length=PACKET_LENGTH, knowns=KNOWNS, dpt_index=DPT_INDEX,
+            backend="file", cache=False, cache_root=None, threads=1):
+        """Initializes the DataDecoder object.
+
+        Seeding is lazy: `ndpts`, `dtypes` and `starting_bytes` are only used
+        once seeded data is viewed, and only the combinations viewed are
+        seeded.
+
+        With `cache`, `decode_knowns` decodes every known of the whole file
+        once, caches the columns on disk (in `cache_root`, or next to the
+        file) and memory-maps them from then on.  See `column_cache`.
+
+        With `threads` > 1, columns are decoded by that many threads, each
+        decoding chunks of whole packets into the same preallocated columns.
+
+        Raises
+        ------
+        DecoderRingError : for an unsupported `backend`, or `threads` < 1.
+        """
+        if backend not in BACKENDS:
+            raise DecoderRingError(
+                "Invalid backend {}; must be one of {}.".format(backend, BACKENDS)
+            )
+
+        if threads < 1:
+            raise DecoderRingError("Invalid threads {}.".format(threads))
+
         self._packet_length = packet_length
         self._knowns = knowns if knowns is not None else {}
         self._dpt_idx = dpt_index
         self._filepath = filepath
         self._filename = os.path.split(filepath)[1]
         self._total_bytes = get_filesize(self._filepath)
-
-        # Seed the last four datapoints.
-        self._seed_df = seed_data(
-            filepath,
-            ndpts=ndpts,
-            dtypes=dtypes,
-            starting_bytes=starting_bytes,
-            packet_length=packet_length,
-            knowns=knowns
-        )
-
-        # Determine the maximum number of data-points in the file.
+        self._backend = backend
+        self._buffer = map_file(filepath) if backend == "mmap" else None
+        self._cache = cache
+        self._cache_root = cache_root
+        self._threads = threads
+
+        # Locate the packets after the header.  Without a header, packets are
+        # aligned to the end of the file.
+        self._data_offset, self._header = read_header(filepath, buffer=self._buffer)
+        self._has_header = self._data_offset is not None
+        if not self._has_header:
+            self._data_offset = self._total_bytes % packet_length
+
+        self._npackets, partial_bytes = divmod(self._total_bytes - self._data_offset,
+                packet_length)
+        if partial_bytes:
+            warn("{} ends with a partial packet of {} bytes; it is ignored.".format(
+                    self._filename, partial_bytes))
+
+        # Seed the last `ndpts` datapoints on demand.
+        self._ndpts = ndpts
+        self._dtypes = list(dtypes) if dtypes is not None else list(DATA_TYPES)
+        self._starting_bytes = list(starting_bytes) if starting_bytes is not None \
+            else list(range(packet_length))
+        self._seed_dfs = {}
+        self._full_seed_df = None
+
+        # Determine the maximum number of data-points in the file from the
+        # header, or else from the dpt field of the last packet (detecting the
+        # dpt field if it is not known).
         self._max_dpts = None
-        if (dpt_index is not None) and (dpt_index in self._knowns):
-            sbyte, dtype, n, _ = self._seed_df.index.min()
-            self._max_dpts = self._seed_df.loc[sbyte, dtype, 1, dpt_index].iloc[0]
+        self._dpt_field = None
+        self._time_field = None
+        if not self._has_header and ((dpt_index is None) or
+                (dpt_index not in self._knowns)):
+            self.detect_fields()
+        self._update_max_dpts()
+
+        # Columns decoded by `refresh`, with spare capacity to append to.
+        self._columns = None
+        self._ncolumns = 0
 
         # Find the known labels
         self._known_labels = {byte_dict["label"]: byte_idx for
@@ -95,8 +192,6 @@ class DataDecoder(object):
         ------
         DecoderRingError : for invalid arguments
         """
-        decoded_data = []
-
         factor = 1.0
         if label in self._known_labels:
             byte_idx = self._known_labels[label]
@@ -115,17 +210,14 @@ class DataDecoder(object):
         if dpts is None:
             raise DecoderRingError("Dpt must be in the knowns or dpts must be specified.")
 
-        with open(self._filepath, "rb") as f:
-            for i, n in enumerate(range(1, dpts + 1)[::-1]):
-                if i == 0:
-                    f.seek(self._total_bytes - dpts * self._packet_length)
-                packet = f.read(self._packet_length)
-
-                decoded_data.append(decode_bytes(packet, byte_idx, dtype) / factor)
+        records = self.read_records(
+            dpts,
+            knowns={byte_idx: {"dtype": dtype, "label": "val"}}
+        )
 
-        return decoded_data
+        return list(np.divide(records["val"], factor, dtype=np.float64))
 
-    def decode_knowns(self, csv_file=None, dpts=None):
+    def decode_knowns(self, csv_file=None, dpts=None, columns=None):
         """Decode all known portions of the file and return as dataframe.
 
         If a csv_file is provided, add those columns, too.
@@ -138,6 +230,9 @@ class DataDecoder(object):
             Specify number of datapoints to parse.  If not specified, dpt must
             be specified in the knowns and will be used to determine who many
             bytes back to parse.
+        columns : list of str, optional
+            Labels of the knowns to decode, in order.  Defaults to all of them.
+            Only these fields are read from each packet.
 
         Returns
         -------
@@ -147,32 +242,31 @@ class DataDecoder(object):
         ------
         DecoderRingError : for invalid arguments
         """
-        data = []
-
         if dpts is None:
             dpts = self._max_dpts
 
         if dpts is None:
             raise DecoderRingError("Dpt must be in the knowns or dpts must be specified.")
 
-        with open(self._filepath, "rb") as f:
-            for i, n in enumerate(range(1, dpts + 1)[::-1]):
-                if i == 0:
-                    f.seek(self._total_bytes - dpts * self._packet_length)
-                # Get position of the first data-point
-                packet = f.read(self._packet_length)
+        fields = self._get_known_fields(columns)
 
-                dpt_data = {}
-                for byte_idx, byte_dict in self._knowns.items():
-                    dpt_data[byte_dict["label"]] = decode_bytes(
-                        packet,
-                        byte_idx,
-                        byte_dict["dtype"]
-                    ) / byte_dict.get("factor", 1)
+        if self._columns is not None:
+            # Validates `dpts`.
+            self._get_offset(dpts)
 
-                data.append(dpt_data)
+            knowns_df = pd.DataFrame({label: self._columns[label][
+                    self._ncolumns - dpts:self._ncolumns] for label, _, _, _ in
+                    fields}, index=pd.RangeIndex(dpts))
+        elif self._cache:
+            # Validates `dpts`.
+            self._get_offset(dpts)
 
-        knowns_df = pd.DataFrame(data)
+            cached = self._get_cached_columns()
+            knowns_df = pd.DataFrame({label: cached[label][self._npackets - dpts:]
+                    for label, _, _, _ in fields}, index=pd.RangeIndex(dpts))
+        else:
+            knowns_df = pd.DataFrame(self._decode_columns(fields, dpts),
+                    index=pd.RangeIndex(dpts))
 
         csv_df = pd.DataFrame()
         if csv_file is not None:
@@ -190,6 +284,829 @@ class DataDecoder(object):
 
         return out_df
 
+    def decode_fields(self, fields, dpts=None):
+        """Decodes arbitrary fields of the last `dpts` packets in one pass.
+
+        Unlike calling `decode_byte_idx` once per field, the file is read
+        once, and only the requested fields are extracted from each packet.
+        Fields may overlap each other or the knowns.
+
+        Parameters
+        ----------
+        fields : list of tuple
+            (byte_idx, dtype) or (byte_idx, dtype, factor) of each field.
+        dpts : int, optional
+            Number of datapoints to parse.  Defaults to all of them.
+
+        Returns
+        -------
+        fields_df : pd.DataFrame
+            One column per field, named "<byte_idx>-<dtype>".
+
+        Raises
+        ------
+        DecoderRingError : for invalid arguments
+        """
+        if dpts is None:
+            dpts = self._max_dpts
+
+        if dpts is None:
+            raise DecoderRingError("Dpt must be in the knowns or dpts must be specified.")
+
+        columns = []
+        for field in fields:
+            byte_idx, dtype = field[:2]
+            factor = field[2] if len(field) > 2 else 1
+            columns.append(("{}-{}".format(byte_idx, dtype), byte_idx, dtype, factor))
+
+        return pd.DataFrame(self._decode_columns(columns, dpts),
+                index=pd.RangeIndex(dpts))
+
+    def _get_cached_columns(self):
+        """Returns every known of every packet, from the cache if up to date.
+
+        On a miss, the columns are decoded and cached.
+
+        Returns
+        -------
+        columns : dict
+            Label to np.array of decoded values (memory-mapped if cached).
+        """
+        columns = column_cache.load_columns(self._filepath, self._knowns,
+                self._packet_length, cache_root=self._cache_root,
+                nrows=self._npackets)
+
+        if columns is None:
+            # Signed before decoding, in case the file grows meanwhile.
+            signature = column_cache.get_file_signature(self._filepath)
+            decoded = self._decode_columns(self._get_known_fields(), self._npackets)
+            columns = column_cache.save_columns(self._filepath, self._knowns,
+                    self._packet_length, decoded, cache_root=self._cache_root,
+                    signature=signature)
+
+            if columns is None:
+                columns = decoded
+
+        return columns
+
+    def refresh(self):
+        """Decodes the packets appended to the file since the last refresh.
+
+        For files which are still being written: the first call decodes every
+        known of every packet (from the cache, with `cache`), and each later
+        call decodes only the complete packets appended since, so its cost
+        scales with the new data.  A partial packet at the end of the file is
+        decoded once the rest of it is written.  The decoded columns are kept
+        in memory (and appended to the cache, with `cache`), and
+        `decode_knowns` is served from them.
+
+        Without a header, packets stay aligned as found on init, unless a
+        header has since been written.
+
+        Returns
+        -------
+        new_df : pd.DataFrame
+            Knowns of the newly decoded packets, indexed by packet position.
+
+        Raises
+        ------
+        DecoderRingError : if the file has shrunk.
+        """
+        total_bytes = get_filesize(self._filepath)
+        signature = column_cache.get_file_signature(self._filepath) if self._cache \
+            else None
+        if total_bytes < self._total_bytes:
+            raise DecoderRingError(
+                "{} shrank from {} to {} bytes; only appending is supported.".format(
+                    self._filename, self._total_bytes, total_bytes)
+            )
+
+        if total_bytes > self._total_bytes:
+            if self._backend == "mmap":
+                self.close()
+                self._buffer = map_file(self._filepath)
+
+            # Seeds are of the last datapoints, which have changed.
+            self._seed_dfs = {}
+            self._full_seed_df = None
+        self._total_bytes = total_bytes
+
+        if not self._has_header:
+            data_offset, header = read_header(self._filepath, buffer=self._buffer)
+
+            if data_offset is not None:
+                self._data_offset, self._header = data_offset, header
+                self._has_header = True
+                self._columns = None
+
+        self._npackets = (self._total_bytes - self._data_offset) // self._packet_length
+        self._update_max_dpts()
+
+        fields = self._get_known_fields()
+        start = self._ncolumns if self._columns is not None else 0
+        if start > self._npackets:
+            raise DecoderRingError("{} has fewer packets than already decoded.".format(
+                    self._filename))
+
+        if (self._columns is None) and self._cache:
+            new = {label: np.array(values) for label, values in
+                    self._get_cached_columns().items()}
+        else:
+            new = self._decode_columns(fields, self._npackets - start,
+                    offset=self._data_offset + start * self._packet_length)
+
+        if self._columns is None:
+            self._columns, self._ncolumns = {}, 0
+        self._append_columns(new)
+
+        if self._cache and start:
+            column_cache.append_columns(self._filepath, self._knowns,
+                    self._packet_length, {label: values[:self._ncolumns] for
+                    label, values in self._columns.items()}, start,
+                    cache_root=self._cache_root, signature=signature)
+
+        return pd.DataFrame(new, index=pd.RangeIndex(start, self._ncolumns))
+
+    async def follow(self, interval=FOLLOW_INTERVAL, idle_timeout=None,
+            backlog=True):
+        """Yields the knowns of packets as they are appended to the file.
+
+        An async iterator for monitoring live tests: the size and modification
+        time of the file are polled every `interval` seconds, and each change
+        is decoded by `refresh` (i.e. only the appended packets), so batches
+        are yielded within about `interval` of being written.  Decoding runs
+        in the default executor of the loop (a pool shared by every follower),
+        so neither polling nor a large decode (e.g. of the backlog) blocks the
+        loop, and many files can be followed on one loop (see `follow_all`).
+        File-system notifications (e.g. inotify) are not used, so any file
+        system, including network shares, can be followed.
+
+        Parameters
+        ----------
+        interval : float
+            Seconds between polls of the file.
+        idle_timeout : float, optional
+            Stop after this many seconds without new packets.  Defaults to
+            following forever.
+        backlog : bool
+            Whether to first yield the packets already in the file.
+
+        Yields
+        ------
+        new_df : pd.DataFrame
+            Knowns of the newly decoded packets, indexed by packet position.
+        """
+        loop = asyncio.get_running_loop()
+        last_stat = None
+        last_new = loop.time()
+        first = True
+
+        while True:
+            stat = os.stat(self._filepath)
+
+            if (stat.st_size, stat.st_mtime_ns) != last_stat:
+                last_stat = (stat.st_size, stat.st_mtime_ns)
+                new_df = await loop.run_in_executor(None, self.refresh)
+
+                if not new_df.empty:
+                    last_new = loop.time()
+
+                    if backlog or not first:
+                        yield new_df
+                first = False
+
+            if (idle_timeout is not None) and (loop.time() - last_new >= idle_timeout):
+                return
+
+            await asyncio.sleep(interval)
+
+    def _append_columns(self, new):
+        """Appends `new` rows to the columns decoded by `refresh`.
+
+        Each column's capacity is doubled whenever it is exceeded, so repeated
+        appends copy each row a constant number of times on average.
+        """
+        nrows = self._ncolumns + (len(next(iter(new.values()))) if new else 0)
+
+        for label, values in new.items():
+            column = self._columns.get(label)
+
+            if (column is None) or (len(column) < nrows):
+                grown = np.empty(max(nrows, 2 * len(column) if column is not None
+                        else 0), dtype=values.dtype)
+                if column is not None:
+                    grown[:self._ncolumns] = column[:self._ncolumns]
+                self._columns[label] = column = grown
+
+            column[self._ncolumns:nrows] = values
+
+        self._ncolumns = nrows
+
+    def _get_known_fields(self, columns=None):
+        """Returns the label, byte idx, data-type and factor of knowns.
+
+        Parameters
+        ----------
+        columns : list of str, optional
+            Labels of the knowns, in order.  Defaults to all of them.
+
+        Returns
+        -------
+        fields : list of (str, int, str, float)
+
+        Raises
+        ------
+        DecoderRingError : for columns not in the knowns.
+        """
+        fields = {byte_dict["label"]: (byte_dict["label"], byte_idx,
+                byte_dict["dtype"], byte_dict.get("factor", 1)) for
+                byte_idx, byte_dict in self._knowns.items()}
+
+        if columns is None:
+            columns = list(fields)
+
+        missing = [label for label in columns if label not in fields]
+        if missing:
+            raise DecoderRingError("Columns {} are not in the knowns.".format(missing))
+
+        return [fields[label] for label in columns]
+
+    def _update_max_dpts(self):
+        """Sets the maximum number of datapoints in the file.
+
+        From the header, or else from the dpt field (known or detected) of the
+        last packet.
+        """
+        if self._has_header:
+            self._max_dpts = self._npackets
+            return
+
+        if (self._dpt_idx is not None) and (self._dpt_idx in self._knowns):
+            dpt_knowns = {self._dpt_idx: self._knowns[self._dpt_idx]}
+        elif self._dpt_field is not None:
+            dpt_knowns = {self._dpt_field.byte_idx: {"dtype": self._dpt_field.dtype,
+                    "label": "dpt"}}
+        else:
+            return
+
+        if self._npackets:
+            records = self.read_records(1, knowns=dpt_knowns)
+            label = next(iter(dpt_knowns.values()))["label"]
+            self._max_dpts = int(records[label][0])
+
+    def _decode_columns(self, fields, dpts, offset=None):
+        """Returns the decoded fields of the last `dpts` packets.
+
+        Packets are read `CHUNK_PACKETS` at a time, and each field is scaled
+        into its own preallocated column, so neither the unused fields nor the
+        whole byte stream are held in memory.  With several threads, the
+        packets are split into at least one chunk per thread, decoded
+        concurrently (NumPy releases the GIL while reading and scaling).
+
+        Parameters
+        ----------
+        fields : list of (str, int, str, float)
+            Label, byte idx, data-type and factor of each field.
+        dpts : int
+            Number of packets, counted back from the end of the file.
+        offset : int, optional
+            Byte offset of the first packet, to decode `dpts` packets from
+            there instead.
+
+        Returns
+        -------
+        columns : dict
+            Label to np.array of decoded values.
+        """
+        packet_dtype = get_fields_dtype(
+            [(label, byte_idx, dtype) for label, byte_idx, dtype, _ in fields],
+            self._packet_length
+        )
+        if offset is None:
+            offset = self._get_offset(dpts)
+
+        # Same data-types as `decode_records`.
+        columns = {label: np.empty(dpts, dtype=np.float64) for label, _, _, _ in fields}
+
+        chunk_packets = CHUNK_PACKETS
+        if self._threads > 1:
+            chunk_packets = max(min(chunk_packets, -(-dpts // self._threads)), 1)
+
+        def decode_chunk(start):
+            # Chunks start on packet boundaries, counted from `offset`.
+            records = read_packets(
+                self._filepath,
+                packet_dtype,
+                offset=offset + start * self._packet_length,
+                count=min(chunk_packets, dpts - start),
+                buffer=self._buffer
+            )
+
+            for label, _, _, factor in fields:
+                np.divide(records[label], factor, dtype=np.float64,
+                        out=columns[label][start:start + len(records)])
+
+        starts = range(0, dpts, chunk_packets)
+        if (self._threads > 1) and (len(starts) > 1):
+            with concurrent.futures.ThreadPoolExecutor(self._threads) as executor:
+                # Consumed to raise any error of a chunk.
+                list(executor.map(decode_chunk, starts))
+        else:
+            for start in starts:
+                decode_chunk(start)
+
+        return columns
+
+    def iter_knowns(self, chunk_packets=CHUNK_PACKETS, dpts=None):
+        """Decodes all known portions of the file, one chunk at a time.
+
+        Yields the same data as `decode_knowns`, split into dataframes of at
+        most `chunk_packets` rows, so memory use is bounded by the chunk size
+        rather than the file size.  Chunks are indexed by their position in
+        the full output.
+
+        Parameters
+        ----------
+        chunk_packets : int
+            Maximum number of packets decoded at a time.
+        dpts : int, optional
+            Specify number of datapoints to parse.  If not specified, dpt must
+            be specified in the knowns.
+
+        Yields
+        ------
+        chunk_df : pd.DataFrame
+
+        Raises
+        ------
+        DecoderRingError : for invalid arguments
+        """
+        if dpts is None:
+            dpts = self._max_dpts
+
+        if dpts is None:
+            raise DecoderRingError("Dpt must be in the knowns or dpts must be specified.")
+
+        if chunk_packets < 1:
+            raise DecoderRingError("Invalid chunk_packets {}.".format(chunk_packets))
+
+        packet_dtype = get_packet_dtype(self._knowns, self._packet_length)
+        offset = self._get_offset(dpts)
+
+        for start in range(0, dpts, chunk_packets):
+            records = read_packets(
+                self._filepath,
+                packet_dtype,
+                offset=offset + start * self._packet_length,
+                count=min(chunk_packets, dpts - start),
+                buffer=self._buffer
+            )
+
+            yield pd.DataFrame(
+                decode_records(records, self._knowns),
+                index=pd.RangeIndex(start, start + len(records))
+            )
+
+    def stats(self, dpts=None, columns=None, chunk_packets=CHUNK_PACKETS):
+        """Computes statistics of the knowns in one pass, in constant memory.
+
+        Packets are decoded `chunk_packets` at a time (with `threads`, if
+        set), and the statistics of each chunk are merged into the running
+        totals, so the decoded file is never held in memory.  The statistics
+        returned merge with those of other files; see `field_stats`.
+
+        Parameters
+        ----------
+        dpts : int, optional
+            Specify number of datapoints to parse.  If not specified, dpt must
+            be specified in the knowns.
+        columns : list of str, optional
+            Labels of the knowns to compute statistics of.  Defaults to all of
+            them.
+        chunk_packets : int
+            Maximum number of packets decoded at a time.
+
+        Returns
+        -------
+        stats : dict
+            Label to `field_stats.FieldStats` (count, mean, min, max and
+            transitions, e.g. of "stp" and "cyc").  See
+            `field_stats.stats_to_frame` for a table including std.
+
+        Raises
+        ------
+        DecoderRingError : for invalid arguments
+        """
+        if dpts is None:
+            dpts = self._max_dpts
+
+        if dpts is None:
+            raise DecoderRingError("Dpt must be in the knowns or dpts must be specified.")
+
+        if chunk_packets < 1:
+            raise DecoderRingError("Invalid chunk_packets {}.".format(chunk_packets))
+
+        fields = self._get_known_fields(columns)
+        offset = self._get_offset(dpts)
+
+        stats = {label: field_stats.EMPTY_STATS for label, _, _, _ in fields}
+        for start in range(0, dpts, chunk_packets):
+            chunk = self._decode_columns(fields, min(chunk_packets, dpts - start),
+                    offset=offset + start * self._packet_length)
+
+            for label, values in chunk.items():
+                stats[label] = field_stats.merge_stats(stats[label],
+                        field_stats.compute_stats(values))
+
+        return stats
+
+    def read_records(self, dpts, knowns=None):
+        """Returns the last `dpts` packets, laid out by `knowns`.
+
+        With the "mmap" backend, the records are a view over the mapped file
+        and each field (e.g. `records["cur"]`) is a strided view; nothing is
+        copied until a field is materialized (e.g. scaled by its factor).
+
+        Parameters
+        ----------
+        dpts : int
+            Number of packets, counted back from the end of the file.
+        knowns : dict, optional
+            Fields to lay out in each packet.  Defaults to the knowns of this
+            decoder.
+
+        Returns
+        -------
+        records : np.array
+            Structured array; see `lib.get_packet_dtype`.
+        """
+        if knowns is None:
+            knowns = self._knowns
+
+        return read_packets(
+            self._filepath,
+            get_packet_dtype(knowns, self._packet_length),
+            offset=self._get_offset(dpts),
+            count=dpts,
+            buffer=self._buffer
+        )
+
+    def resync_knowns(self, dpt_check=True, start_byte=START_BYTE,
+            confirm=RESYNC_CONFIRM):
+        """Decodes all known portions of the file, resynchronizing on corruption.
+
+        Unlike `decode_knowns`, packets are not assumed to be evenly spaced:
+        packets are validated by their start byte (and, optionally, dpt
+        continuity) from the start of the data, and after dropped or
+        corrupted bytes decoding resumes at the next valid packet.  See
+        `locate_packets`.  Clean files are decoded at nearly the speed of
+        `decode_knowns`.
+
+        Parameters
+        ----------
+        dpt_check : bool
+            Whether packets must also continue the count of the dpt field (if
+            it is known or was detected).
+        start_byte : int
+            Value of the first byte of each packet.
+        confirm : int
+            Number of following start bytes confirming a resynchronization.
+
+        Returns
+        -------
+        result : ResyncResult
+            Decoded knowns of every packet found, whether each is valid, and
+            the byte ranges of the file skipped.
+        """
+        base = self._data_offset if self._has_header else 0
+
+        # Map the file, rather than reading it into memory, for the "file"
+        # backend too; the stream is only scanned a block at a time.
+        buffer = self._buffer
+        if (buffer is None) and (get_filesize(self._filepath) > 0):
+            buffer = map_file(self._filepath)
+
+        try:
+            return self._resync_knowns(buffer, base, dpt_check, start_byte, confirm)
+        finally:
+            if (buffer is not None) and (buffer is not self._buffer):
+                try:
+                    buffer.close()
+                except BufferError:
+                    # Views are still exported; the map closes once they are freed.
+                    pass
+
+    def _resync_knowns(self, buffer, base, dpt_check, start_byte, confirm):
+        """Decodes all known portions of `buffer`; see `resync_knowns`."""
+        data = read_packets(self._filepath, np.uint8, offset=base, buffer=buffer)
+
+        dpt_index, dpt_dtype = None, None
+        if dpt_check and (self._dpt_idx in self._knowns):
+            dpt_index, dpt_dtype = self._dpt_idx, self._knowns[self._dpt_idx]["dtype"]
+        elif dpt_check and (self._dpt_field is not None):
+            dpt_index, dpt_dtype = self._dpt_field.byte_idx, self._dpt_field.dtype
+
+        starts, valid, skipped = locate_packets(
+            data,
+            self._packet_length,
+            start_byte=start_byte,
+            dpt_index=dpt_index,
+            dpt_dtype=dpt_dtype,
+            confirm=confirm
+        )
+
+        records = gather_packets(data, starts, get_packet_dtype(self._knowns,
+                self._packet_length))
+
+        return ResyncResult(
+            data=pd.DataFrame(
+                decode_records(records, self._knowns),
+                index=pd.RangeIndex(len(records))
+            ),
+            valid=valid,
+            skipped=[(base + start, base + stop) for start, stop in skipped],
+        )
+
+    def infer_knowns(self, npackets=INFER_PACKETS, dtypes=None,
+            min_score=infer_data.MIN_SCORE):
+        """Returns suggested knowns for the bytes not already in the knowns.
+
+        Candidate fields are scored on the last `npackets` packets; see
+        `infer_data.score_fields`.
+
+        Parameters
+        ----------
+        npackets : int
+            Number of packets, from the end of the file, to score.
+        dtypes : list of str, optional
+            Data-types to consider.  Defaults to all of `lib.DATA_TYPES`.
+        min_score : float
+            Fields scoring below this are not suggested.
+
+        Returns
+        -------
+        knowns : dict
+            Suggested knowns, ordered from highest to lowest score.  Merge
+            with the current knowns (i.e. `{**knowns, **suggested}`) to
+            decode them.
+        """
+        return infer_data.infer_knowns(
+            self.read_tail_packets(npackets),
+            dtypes=dtypes,
+            knowns=self._knowns,
+            min_score=min_score
+        )
+
+    def detect_fields(self, npackets=DETECT_PACKETS):
+        """Detects the dpt and time fields in the last `npackets` packets.
+
+        The dpt field is an unsigned integer incrementing by 1 every packet;
+        its last value sets the maximum number of datapoints if the file has no
+        header and the dpt field is not in the knowns.  The time field is the
+        strictly increasing field with a constant step, not overlapping the
+        knowns or the dpt field.
+        See `infer_data.detect_dpt_field` and `infer_data.detect_time_field`.
+
+        Parameters
+        ----------
+        npackets : int
+            Number of packets, from the end of the file, to search.
+
+        Returns
+        -------
+        dpt_field : infer_data.DetectedField or None
+        time_field : infer_data.DetectedField or None
+        """
+        packets = self.read_tail_packets(npackets)
+
+        self._dpt_field = infer_data.detect_dpt_field(packets,
+                knowns=self._knowns, max_value=self._total_bytes)
+
+        knowns = dict(self._knowns)
+        if self._dpt_field is not None:
+            knowns[self._dpt_field.byte_idx] = {"dtype": self._dpt_field.dtype}
+
+            if not self._has_header and (self._dpt_idx not in self._knowns):
+                self._max_dpts = int(self._dpt_field.last)
+
+        self._time_field = infer_data.detect_time_field(packets, knowns=knowns)
+
+        return self._dpt_field, self._time_field
+
+    def read_tail_packets(self, npackets):
+        """Returns up to `npackets` raw packets from the end of the file.
+
+        Returns
+        -------
+        packets : np.array(uint8)
+            Array of shape (npackets, packet_length).
+        """
+        npackets = min(npackets, self._npackets)
+
+        return read_packets(
+            self._filepath,
+            np.dtype(("u1", self._packet_length)),
+            offset=self._get_offset(npackets),
+            count=npackets,
+            buffer=self._buffer
+        )
+
+    def __getitem__(self, key):
+        """Returns the decoded knowns of the packets at positions `key`.
+
+        Packets are read directly from their offsets, so the time taken
+        depends on the number of packets returned, not their position.
+
+        Parameters
+        ----------
+        key : int or slice
+            Position(s) of packets, counted from 0 at the first packet (and
+            from -1 at the last).
+
+        Returns
+        -------
+        knowns_df : pd.DataFrame
+            Indexed by packet position.
+
+        Raises
+        ------
+        IndexError : if an int `key` is out of range.
+        """
+        if isinstance(key, slice):
+            positions = range(*key.indices(self._npackets))
+        else:
+            position = operator.index(key)
+            if position < 0:
+                position += self._npackets
+
+            if not 0 <= position < self._npackets:
+                raise IndexError("Packet {} out of range.".format(key))
+
+            positions = range(position, position + 1)
+
+        return self._decode_positions(positions)
+
+    def __len__(self):
+        """Returns the number of packets in the file."""
+        return self._npackets
+
+    def packets(self, dpt_range):
+        """Returns the decoded knowns of the datapoints in `dpt_range`.
+
+        Datapoints are numbered from 1 at the first packet (as is the dpt
+        field of the sample data).  See `__getitem__`.
+
+        Parameters
+        ----------
+        dpt_range : range or tuple of int
+            Datapoints to decode, as a range or its (start, stop[, step]).
+
+        Returns
+        -------
+        knowns_df : pd.DataFrame
+            Indexed by datapoint.
+
+        Raises
+        ------
+        DecoderRingError : if a datapoint is not in the file.
+        """
+        if not isinstance(dpt_range, range):
+            dpt_range = range(*dpt_range)
+
+        if len(dpt_range) and not (1 <= min(dpt_range[0], dpt_range[-1]) and
+                max(dpt_range[0], dpt_range[-1]) <= self._npackets):
+            raise DecoderRingError(
+                "Invalid dpt_range {}; {} has {} packets.".format(dpt_range,
+                    self._filename, self._npackets)
+            )
+
+        positions = range(dpt_range.start - 1, dpt_range.stop - 1, dpt_range.step)
+        knowns_df = self._decode_positions(positions)
+        knowns_df.index = pd.RangeIndex(dpt_range.start, dpt_range.stop,
+                dpt_range.step)
+
+        return knowns_df
+
+    def query_time(self, t0=None, t1=None, label="time"):
+        """Returns the decoded knowns of the packets with `t0` <= time < `t1`.
+
+        The time field must be known and non-decreasing: the first and last
+        matching packets are found by binary search, decoding O(log n) single
+        packets, and only the packets between them are decoded.
+
+        Parameters
+        ----------
+        t0, t1 : float or datetime.datetime, optional
+            Bounds of the time field (decoded, i.e. divided by its factor).
+            Datetimes are converted to seconds since the start time in the
+            header.  None for no bound.
+        label : str
+            Label of the time field in the knowns.
+
+        Returns
+        -------
+        knowns_df : pd.DataFrame
+            Indexed by packet position.
+
+        Raises
+        ------
+        DecoderRingError : if the time field is not known or decreases from
+            the first to the last packet, or a datetime is given without a
+            header start time.
+        """
+        if label not in self._known_labels:
+            raise DecoderRingError("Time field {} must be in the knowns.".format(label))
+
+        byte_idx = self._known_labels[label]
+        time_dtype = get_packet_dtype({byte_idx: self._knowns[byte_idx]},
+                self._packet_length)
+        factor = self._knowns[byte_idx].get("factor", 1)
+
+        def get_time(position):
+            record = read_packets(
+                self._filepath,
+                time_dtype,
+                offset=self._data_offset + position * self._packet_length,
+                count=1,
+                buffer=self._buffer
+            )
+            return float(record[label][0]) / factor
+
+        if self._npackets and (get_time(0) > get_time(self._npackets - 1)):
+            raise DecoderRingError("Time field {} is not monotonic.".format(label))
+
+        start = 0 if t0 is None else \
+            _bisect_left(get_time, self._to_seconds(t0), self._npackets)
+        stop = self._npackets if t1 is None else \
+            _bisect_left(get_time, self._to_seconds(t1), self._npackets)
+
+        return self._decode_positions(range(start, max(start, stop)))
+
+    def _to_seconds(self, t):
+        """Returns time `t` in seconds since the header start time, if a datetime."""
+        if not isinstance(t, datetime.datetime):
+            return t
+
+        if self._header is None:
+            raise DecoderRingError("A header start time is needed to query by datetime.")
+
+        return (t - self._header.start_time).total_seconds()
+
+    def _decode_positions(self, positions):
+        """Returns the decoded knowns of the packets at `positions` (a range)."""
+        packet_dtype = get_packet_dtype(self._knowns, self._packet_length)
+
+        if len(positions):
+            first = min(positions[0], positions[-1])
+            records = read_packets(
+                self._filepath,
+                packet_dtype,
+                offset=self._data_offset + first * self._packet_length,
+                count=len(positions),
+                buffer=self._buffer,
+                step=abs(positions.step)
+            )
+
+            if positions.step < 0:
+                records = records[::-1]
+        else:
+            records = np.empty(0, dtype=packet_dtype)
+
+        return pd.DataFrame(
+            decode_records(records, self._knowns),
+            index=pd.RangeIndex(positions.start, positions.stop, positions.step)
+        )
+
+    @property
+    def header(self):
+        """packet_map.Header : metadata in the header, or None if not found."""
+        return self._header
+
+    @property
+    def data_offset(self):
+        """int : byte position of the first packet."""
+        return self._data_offset
+
+    @property
+    def npackets(self):
+        """int : number of (whole) packets in the file."""
+        return self._npackets
+
+    def _get_offset(self, dpts):
+        """Returns the byte position of the first of the last `dpts` packets.
+
+        Raises
+        ------
+        DecoderRingError : if there are fewer than `dpts` packets in the file.
+        """
+        if not 0 <= dpts <= self._npackets:
+            raise DecoderRingError(
+                "Invalid dpts {}; {} has {} packets.".format(dpts, self._filename,
+                    self._npackets)
+            )
+
+        return self._data_offset + (self._npackets - dpts) * self._packet_length
+
     def view_byte_idx(self, byte_idx, starting_byte, dtypes=None):
         """Returns view of byte at position `byte_idx` in data types `dtypes`.
 
@@ -215,8 +1132,12 @@ class DataDecoder(object):
         --------
         view_byte_idx
         """
-        return view_byte_idx(self._seed_df, byte_idx, starting_byte,
-                dtypes=dtypes)
+        if dtypes is None:
+            dtypes = self._dtypes
+
+        seed_df = self._get_seed_df([starting_byte], dtypes)
+
+        return view_byte_idx(seed_df, byte_idx, starting_byte, dtypes=dtypes)
 
     def view_dtypes(self, starting_byte, dtypes):
         """Returns a view of parsed data for a given starting byte and dtypes.
@@ -251,7 +1172,92 @@ class DataDecoder(object):
         --------
         view_byte_idx
         """
-        return view_dtypes(self._seed_df, starting_byte, dtypes)
+        return view_dtypes(self._get_seed_df([starting_byte], dtypes),
+                starting_byte, dtypes)
+
+    @property
+    def _seed_df(self):
+        """Seeded data for all `dtypes` and `starting_bytes` given on init.
+
+        Seeded on first access.
+        """
+        if self._full_seed_df is None:
+            self._full_seed_df = seed_data(
+                self._filepath,
+                ndpts=self._ndpts,
+                dtypes=self._dtypes,
+                starting_bytes=self._starting_bytes,
+                packet_length=self._packet_length,
+                knowns=self._knowns,
+                offset=self._get_offset(self._ndpts),
+                buffer=self._buffer
+            )
+
+        return self._full_seed_df
+
+    def _get_seed_df(self, starting_bytes, dtypes):
+        """Returns seeded data for `starting_bytes` and `dtypes`.
+
+        Only combinations not seeded by a previous call are seeded; results
+        are cached by (starting_byte, dtype).
+
+        Raises
+        ------
+        DecoderRingError : for invalid `starting_bytes`.
+        """
+        for starting_byte in starting_bytes:
+            if starting_byte not in range(self._packet_length):
+                raise DecoderRingError(
+                    "Invalid starting_byte {}; must be in the packet.".format(starting_byte)
+                )
+
+            missing = [dtype for dtype in dtypes
+                    if (starting_byte, dtype) not in self._seed_dfs]
+
+            if not missing:
+                continue
+
+            seed_df = seed_data(
+                self._filepath,
+                ndpts=self._ndpts,
+                dtypes=missing,
+                starting_bytes=[starting_byte],
+                packet_length=self._packet_length,
+                knowns=self._knowns,
+                offset=self._get_offset(self._ndpts),
+                buffer=self._buffer
+            )
+
+            for dtype in missing:
+                self._seed_dfs[(starting_byte, dtype)] = seed_df.xs(
+                    (starting_byte, dtype),
+                    level=["sbyte", "dtype"],
+                    drop_level=False
+                )
+
+        return pd.concat([self._seed_dfs[(starting_byte, dtype)] for
+                starting_byte in starting_bytes for dtype in dtypes]).sort_index()
+
+    def close(self):
+        """Releases the memory-map of the file, if any.
+
+        Records previously returned by the "mmap" backend keep the mapping
+        alive until they are garbage collected.
+        """
+        if self._buffer is not None:
+            buffer, self._buffer = self._buffer, None
+
+            try:
+                buffer.close()
+            except BufferError:
+                # Views are still exported; the map closes once they are freed.
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def __repr__(self):
         """String representation of the DataDecoder."""
@@ -261,29 +1267,432 @@ class DataDecoder(object):
         """Returns a well-formatted summary of this DataDecoder."""
         output = [
             "Packet Length: {}".format(self._packet_length),
+            "Backend: {}".format(self._backend),
             "Total Bytes: {}".format(self._total_bytes),
+            "Header: {}".format(self._header),
+            "Data Offset: {}".format(self._data_offset),
+            "Packets: {}".format(self._npackets),
             "Dpt Idx: {}".format(self._dpt_idx),
             "Max Dpts: {}".format(self._max_dpts),
+            "Dpt Field: {}".format(self._dpt_field),
+            "Time Field: {}".format(self._time_field),
             "Knowns: {}".format(self._known_labels),
         ]
 
         return "<DataDecoder: {}\n\t{}".format(self._filepath, "\n\t".join(output))
 
 
-def seed_data(filepath, ndpts, dtypes=None, starting_bytes=None,
-        packet_length=PACKET_LENGTH, knowns=KNOWNS):
-    """Returns dataframe, indexed by byte position, of each byte interpretted as different data types.
+async def follow_all(decoders, interval=FOLLOW_INTERVAL, idle_timeout=None,
+        backlog=True):
+    """Follows many files at once, on the running event loop.
+
+    Merges `DataDecoder.follow` of each decoder, so one process can monitor
+    many channels without a thread per file.
+
+    Parameters
+    ----------
+    decoders : list of DataDecoder
+    interval, idle_timeout, backlog
+        See `DataDecoder.follow`.
+
+    Yields
+    ------
+    decoder : DataDecoder
+        Decoder of the file appended to.
+    new_df : pd.DataFrame
+        Knowns of the newly decoded packets, indexed by packet position.
+    """
+    queue = asyncio.Queue()
+
+    async def _follow(decoder):
+        try:
+            async for new_df in decoder.follow(interval=interval,
+                    idle_timeout=idle_timeout, backlog=backlog):
+                await queue.put((decoder, new_df))
+        except Exception as e:
+            await queue.put((decoder, e))
+        finally:
+            await queue.put((decoder, None))
+
+    tasks = [asyncio.ensure_future(_follow(decoder)) for decoder in decoders]
+    remaining = len(tasks)
+
+    try:
+        while remaining:
+            decoder, new_df = await queue.get()
+
+            if new_df is None:
+                remaining -= 1
+            elif isinstance(new_df, Exception):
+                raise new_df
+            else:
+                yield decoder, new_df
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# Outcome of decoding one file with `decode_many`.  `output` is the .npz file of
+# decoded columns, or None if the file failed with `error`.
+DecodeResult = namedtuple("DecodeResult", ["path", "npackets", "output", "error"])
+
+
+def decode_many(paths, output_dir, knowns=KNOWNS, packet_length=PACKET_LENGTH,
+        workers=None, chunksize=DECODE_MANY_CHUNK, **decoder_kwargs):
+    """Decodes the knowns of many files in parallel, with a process pool.
+
+    Files are dispatched `chunksize` at a time, so that tasks are not dominated
+    by inter-process overhead for small files.  Each worker writes the decoded
+    columns of a file to "<output_dir>/<filename>.npz" (see `np.load`), so only
+    a small `DecodeResult` is sent back to the parent.  A file which fails to
+    decode does not stop the others; its result holds the error instead.
+
+    Parameters
+    ----------
+    paths : list of str
+        Files to decode.  Their filenames must be unique.
+    output_dir : str
+        Directory to write the decoded columns to (created if needed).
+    knowns : dict
+        Portions of the byte map that are known.  See `DataDecoder`.
+    packet_length : int
+        Number of bytes in each packet.
+    workers : int, optional
+        Number of processes.  Defaults to the number of CPUs.
+    chunksize : int
+        Number of files decoded by each task.
+    **decoder_kwargs
+        Passed to each `DataDecoder` (e.g. `dpt_index` or `backend`).
+
+    Yields
+    ------
+    result : DecodeResult
+        One per file, in order of completion.
+
+    Raises
+    ------
+    DecoderRingError : for repeated filenames.
+    """
+    paths = list(paths)
+    filenames = [os.path.basename(path) for path in paths]
+    if len(set(filenames)) != len(filenames):
+        raise DecoderRingError("Filenames must be unique to name their outputs.")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(_decode_files, paths[start:start + chunksize],
+                output_dir, knowns, packet_length, decoder_kwargs) for start in
+                range(0, len(paths), chunksize)]
+
+        for future in concurrent.futures.as_completed(futures):
+            for result in future.result():
+                yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _decode_files(paths, output_dir, knowns, packet_length, decoder_kwargs):
+    """Decodes the knowns of each file in `paths`; the task run by `decode_many`.
+
+    Returns
+    -------
+    results : list of DecodeResult
+    """
+    results = []
+
+    for path in paths:
+        try:
+            decoder = DataDecoder(path, knowns=knowns, packet_length=packet_length,
+                    **decoder_kwargs)
+            with decoder:
+                knowns_df = decoder.decode_knowns()
+
+            output = os.path.join(output_dir, "{}.npz".format(os.path.basename(path)))
+            np.savez(output, **{label: knowns_df[label].to_numpy() for label in
+                    knowns_df})
+
+            results.append(DecodeResult(path, len(knowns_df), output, None))
+        except Exception as e:
+            # Exceptions may not be picklable, so only their message is returned.
+            results.append(DecodeResult(path, None, None, "{}: {}".format(
+                    type(e).__name__, e)))
+
+    return results
+
+
+def seed_data(filepath, ndpts, dtypes=None, starting_bytes=None,
+        packet_length=PACKET_LENGTH, knowns=KNOWNS, offset=None, buffer=None):
+    """Returns dataframe, indexed by byte position, of each byte interpretted as different data types.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to file to parse
+    ndpts : int
+        Number of datapoints from the end of the file to parse.
+    starting_bytes : list of int or None
+        Position to start parsing bytes from
+    packet_length : int
+        Number of bytes in each packet
+    knowns : dict
+        Portions of the byte map that are known.  Key is starting byte idx.
+        Value is a dict containing, at least:
+            "dtype" : str
+                Datatype bytes should be parsed as
+            "label" : str
+                Column label for the data.
+    offset : int, optional
+        Byte position of the first packet.  Defaults to `ndpts` packets back
+        from the end of the file.
+    buffer : mmap.mmap, optional
+        Memory-map of `filepath`.  If provided, packets are read from it.
+
+    Returns
+    -------
+    seed_df : pd.DataFrame
+
+    See Also
+    --------
+    seed_tensor
+    """
+    if knowns is None:
+        knowns = {}
+
+    tensor = seed_tensor(
+        filepath,
+        ndpts,
+        dtypes=dtypes,
+        starting_bytes=starting_bytes,
+        packet_length=packet_length,
+        knowns=knowns,
+        offset=offset,
+        buffer=buffer
+    )
+
+    npackets = len(tensor.ns)
+
+    # Decode the knowns of every packet once; they are shared by every block.
+    known_values = {}
+    for byte_idx, byte_dict in knowns.items():
+        values, valid = _cast_known(tensor.packets, byte_idx, byte_dict["dtype"])
+        known_values[byte_idx] = _as_objects(values) if valid else \
+            np.full(npackets, None, dtype=object)
+
+    # Each (dtype, starting_byte) is a block of (npackets, nidx) rows.
+    blocks = {"sbyte": [], "dtype": [], "idx": [], "val": [], "label": []}
+
+    for dtype in tensor.dtypes:
+        values = tensor.values[dtype]
+        valid = tensor.valid[dtype]
+
+        for starting_byte in tensor.starting_bytes:
+            plan = get_layout_plan(dtype, starting_byte, knowns,
+                    packet_length=packet_length)
+
+            idx = [byte_idx for byte_idx, _, _ in plan.rows]
+            vals, labels = [], []
+            for _, kind, entry in plan.rows:
+                if kind == "static":
+                    vals.append(entry["val"])
+                    labels.append(entry.get("label"))
+                else:
+                    vals.append(None)
+                    labels.append(entry[1] if kind == "known" else FILLED_BYTE)
+
+            # Populate the values of every packet, one row position at a time.
+            val_block = np.tile(np.array(vals, dtype=object), (npackets, 1))
+            for pos, (byte_idx, kind, _) in enumerate(plan.rows):
+                if kind == "known":
+                    val_block[:, pos] = known_values[byte_idx]
+                elif kind == "value" and byte_idx < packet_length and valid[byte_idx]:
+                    val_block[:, pos] = _as_objects(values[:, byte_idx])
+
+            nidx = len(idx)
+            blocks["sbyte"].append(np.full((npackets, nidx), starting_byte))
+            blocks["dtype"].append(np.full((npackets, nidx), dtype, dtype=object))
+            blocks["idx"].append(np.tile(idx, (npackets, 1)))
+            blocks["val"].append(val_block)
+            blocks["label"].append(
+                np.tile(np.array(labels, dtype=object), (npackets, 1)))
+
+    # Stacking blocks side-by-side orders rows by packet, dtype, sbyte, idx.
+    data = {key: np.hstack(block).ravel() for key, block in blocks.items()}
+    data["n"] = np.repeat(tensor.ns, len(data["idx"]) // max(npackets, 1))
+
+    df = pd.DataFrame(data, columns=["sbyte", "dtype", "n", "idx", "val", "label"])
+
+    # Re-index for more efficient decoding later
+    return df.set_index(["sbyte", "dtype", "n", "idx"]).fillna("")
+
+
+SeedTensor = namedtuple("SeedTensor", ["ns", "dtypes", "starting_bytes",
+        "packets", "values", "valid", "known", "first", "filled", "wasted"])
+SeedTensor.__doc__ = """Every byte offset of the seeded packets in every data-type.
+
+Attributes
+----------
+ns : np.array(int)
+    Ordinal from the end of each packet (e.g. 1 is the "last").
+dtypes : list of str
+starting_bytes : list of int
+packets : np.array(uint8)
+    Raw packets, of shape (npackets, packet_length).
+values : dict
+    Data-type to np.array of shape (npackets, packet_length) with the value
+    starting at each byte of each packet.  See `lib.cast_offsets`.
+valid : dict
+    Data-type to np.array(bool) of shape (packet_length,); False where too
+    few bytes remain in the packet to read the data-type.
+known : np.array(bool)
+    Mask of shape (packet_length,) of bytes populated by known values.
+first : dict
+    Data-type to np.array(bool) of shape (nstarting_bytes, packet_length) of
+    the bytes where a new value is decoded.
+filled : dict
+    Data-type to np.array(bool) of shape (nstarting_bytes, packet_length) of
+    the bytes filled by decoded values.
+wasted : dict
+    Data-type to np.array(bool) of shape (nstarting_bytes, packet_length) of
+    the bytes that can not be filled.
+"""
+
+
+def seed_tensor(filepath, ndpts, dtypes=None, starting_bytes=None,
+        packet_length=PACKET_LENGTH, knowns=KNOWNS, offset=None, buffer=None):
+    """Returns every byte of the last `ndpts` packets in every data-type.
+
+    The packets are read into one (ndpts, packet_length) array, and every
+    offset is reinterpreted as each data-type at once.  The layout of known,
+    wasted and filled bytes depends only on the data-type and starting byte,
+    so it is computed once and returned as masks.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to file to parse
+    ndpts : int
+        Number of datapoints from the end of the file to parse.
+    dtypes : list of str, optional
+        Data-types to decode.  Defaults to all of `lib.DATA_TYPES`.
+    starting_bytes : list of int or None
+        Position to start parsing bytes from
+    packet_length : int
+        Number of bytes in each packet
+    knowns : dict
+        Portions of the byte map that are known.  Key is starting byte idx.
+        Value is a dict containing, at least:
+            "dtype" : str
+                Datatype bytes should be parsed as
+            "label" : str
+                Column label for the data.
+    offset : int, optional
+        Byte position of the first packet.  Defaults to `ndpts` packets back
+        from the end of the file.
+    buffer : mmap.mmap, optional
+        Memory-map of `filepath`.  If provided, packets are read from it.
+
+    Returns
+    -------
+    tensor : SeedTensor
+    """
+    if dtypes is None:
+        dtypes = list(DATA_TYPES)
+
+    if starting_bytes is None:
+        starting_bytes = range(0, packet_length)
+
+    if knowns is None:
+        knowns = {}
+
+    dtypes = list(dtypes)
+    starting_bytes = list(starting_bytes)
+
+    packets = read_packets(
+        filepath,
+        np.dtype(("u1", packet_length)),
+        offset=offset if offset is not None else
+            get_filesize(filepath) - ndpts * packet_length,
+        count=ndpts,
+        buffer=buffer
+    )
+
+    known = np.zeros(packet_length, dtype=bool)
+    known_bytes = [i for i in _get_known_bytes(knowns) if i < packet_length]
+    known[known_bytes] = True
+
+    values, valid, first, filled, wasted = {}, {}, {}, {}, {}
+
+    for dtype in dtypes:
+        values[dtype], valid[dtype] = cast_offsets(packets, dtype)
+
+        shape = (len(starting_bytes), packet_length)
+        first[dtype] = np.zeros(shape, dtype=bool)
+        filled[dtype] = np.zeros(shape, dtype=bool)
+        wasted[dtype] = np.zeros(shape, dtype=bool)
+
+        for s, starting_byte in enumerate(starting_bytes):
+            plan = get_layout_plan(dtype, starting_byte, knowns,
+                    packet_length=packet_length)
+
+            filled_bytes = [i for i in plan.filled_bytes if i < packet_length]
+            filled[dtype][s, filled_bytes] = True
+            wasted[dtype][s, list(plan.wasted_bytes)] = True
+            first[dtype][s, [i for i in plan.first_bytes if i in filled_bytes]] = True
+
+    return SeedTensor(
+        ns=np.arange(len(packets), 0, -1),
+        dtypes=dtypes,
+        starting_bytes=starting_bytes,
+        packets=packets,
+        values=values,
+        valid=valid,
+        known=known,
+        first=first,
+        filled=filled,
+        wasted=wasted,
+    )
+
+
+# Maximum number of byte-layout plans kept by `get_layout_plan`.
+LAYOUT_CACHE_SIZE = 4096
+
+LayoutPlan = namedtuple("LayoutPlan", ["first_bytes", "wasted_bytes",
+        "filled_bytes", "rows"])
+LayoutPlan.__doc__ = """Packet-independent layout of a packet decoded as one data-type.
+
+Attributes
+----------
+first_bytes : tuple of int
+    See `_get_first_bytes`.
+wasted_bytes : tuple of int
+    See `_get_wasted_bytes`.
+filled_bytes : tuple of int
+    See `_get_filled_bytes`.
+rows : tuple of (int, str, various)
+    Byte idx, kind and entry for each byte, in the order `decode_packet`
+    populates them.  Kind is one of:
+        "known" : entry is (dtype, label) of the known starting at the byte.
+        "value" : entry is None; the byte starts a value of the data-type.
+        "static" : entry is the {val, label} dict of the byte.
+"""
+
+
+def get_layout_plan(dtype, starting_byte, knowns, packet_length=PACKET_LENGTH):
+    """Returns the layout of a packet decoded as `dtype` from `starting_byte`.
+
+    The layout does not depend on the packet contents, so plans are cached
+    (least-recently-used, up to `LAYOUT_CACHE_SIZE`) and shared across every
+    packet and every `DataDecoder`.
 
     Parameters
     ----------
-    filepath : str
-        Path to file to parse
-    ndpts : int
-        Number of datapoints from the end of the file to parse.
-    starting_bytes : list of int or None
-        Position to start parsing bytes from
-    packet_length : int
-        Number of bytes in each packet
+    dtype : str
+        Key of data type in `DATA_TYPES`.
+    starting_byte : int
+        Position bytes where decoded from (in whichever data-type).  Bytes
+        before this position are assumed to be "start bytes".
     knowns : dict
         Portions of the byte map that are known.  Key is starting byte idx.
         Value is a dict containing, at least:
@@ -291,60 +1700,84 @@ def seed_data(filepath, ndpts, dtypes=None, starting_bytes=None,
                 Datatype bytes should be parsed as
             "label" : str
                 Column label for the data.
+    packet_length : int
+        Number of bytes in each packet.
 
     Returns
     -------
-    seed_df : pd.DataFrame
+    plan : LayoutPlan
     """
-    if dtypes is None:
-        dtypes = list(DATA_TYPES)
-
-    if starting_bytes is None:
-        starting_bytes = range(0, packet_length)
-
     if knowns is None:
         knowns = {}
 
-    data = []
+    frozen_knowns = tuple(
+        (byte_idx, byte_dict["dtype"], byte_dict["label"])
+        for byte_idx, byte_dict in knowns.items()
+    )
+
+    return _get_layout_plan(dtype, starting_byte, frozen_knowns, packet_length)
 
-    with open(filepath, "rb") as f:
-        for i, n in enumerate(range(1, ndpts + 1)[::-1]):
-            if i == 0:
-                f.seek(get_filesize(filepath) - ndpts * packet_length)
-
-            # Select current packet
-            # packet = get_packet(byte_stream, n, packet_length=packet_length)
-            packet = f.read(packet_length)
-            known_data = fill_known_bytes(packet, knowns, packet_length=packet_length)
-
-            for dtype in dtypes:
-                nbytes = get_nbytes(dtype)
-
-                for starting_byte in starting_bytes:
-                    # Parse values
-                    tmp_df = pd.DataFrame(
-                        decode_packet(
-                            packet,
-                            dtype,
-                            starting_byte,
-                            packet_length,
-                            knowns=knowns,
-                            known_data=known_data
-                        )
-                    ).T
-
-                    # Add labels
-                    tmp_df["sbyte"] = starting_byte
-                    tmp_df["n"] = n
-                    tmp_df["dtype"] = dtype
-
-                    data.append(tmp_df)
-
-    df = pd.concat(data)
-    df.index.name = "idx"
 
-    # Re-index for more efficient decoding later
-    return df.reset_index().set_index(["sbyte", "dtype", "n", "idx"]).fillna("")
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _get_layout_plan(dtype, starting_byte, frozen_knowns, packet_length):
+    """Computes a `LayoutPlan`; see `get_layout_plan`."""
+    knowns = {byte_idx: {"dtype": known_dtype, "label": label}
+            for byte_idx, known_dtype, label in frozen_knowns}
+    nbytes = get_nbytes(dtype)
+
+    known_bytes = _get_known_bytes(knowns)
+    first_bytes = _get_first_bytes(starting_byte, nbytes, packet_length=packet_length)
+    wasted_bytes = _get_wasted_bytes(starting_byte, nbytes, knowns,
+            packet_length=packet_length, known_bytes=known_bytes,
+            first_bytes=first_bytes)
+    filled_bytes = _get_filled_bytes(starting_byte, nbytes, knowns,
+            packet_length=packet_length, known_bytes=known_bytes,
+            first_bytes=first_bytes, wasted_bytes=wasted_bytes)
+
+    # Mirror fill_known_bytes, then the filler and value bytes.
+    rows = {i: ("static", {"val": None, "label": None}) for i in range(packet_length)}
+
+    for byte_idx, known_dtype, label in frozen_knowns:
+        rows[byte_idx] = ("known", (known_dtype, label))
+
+        for j in range(byte_idx + 1, byte_idx + get_nbytes(known_dtype)):
+            rows[j] = ("static", {"val": FILLED_KNOWN_BYTE, "label": label})
+
+    for byte_idx in wasted_bytes:
+        rows[byte_idx] = ("static", {"val": WASTED_BYTE})
+
+    for byte_idx in filled_bytes:
+        rows[byte_idx] = ("static", {"val": FILLED_BYTE})
+
+    filled_set = set(filled_bytes)
+    for byte_idx in first_bytes:
+        if byte_idx in filled_set:
+            rows[byte_idx] = ("value", None)
+
+    return LayoutPlan(
+        first_bytes=tuple(first_bytes),
+        wasted_bytes=tuple(wasted_bytes),
+        filled_bytes=tuple(filled_bytes),
+        rows=tuple((byte_idx, kind, entry) for byte_idx, (kind, entry) in rows.items()),
+    )
+
+
+def _cast_known(packets, byte_idx, dtype):
+    """Returns values of `dtype` at `byte_idx` of `packets`, and whether they fit."""
+    if byte_idx >= packets.shape[1]:
+        return None, False
+
+    values, valid = cast_offsets(packets[:, byte_idx:byte_idx + get_nbytes(dtype)], dtype)
+
+    return values[:, 0], bool(valid[0])
+
+
+def _as_objects(values):
+    """Returns `values` as an object array, keeping numpy scalar types."""
+    objects = np.empty(values.size, dtype=object)
+    objects[:] = list(values.ravel())
+
+    return objects.reshape(values.shape)
 
 
 def view_byte_idx(seed_df, byte_idx, starting_byte, dtypes=None):
@@ -484,6 +1917,9 @@ def decode_packet(packet, dtype, starting_byte, packet_length=PACKET_LENGTH,
                 Datatype bytes should be parsed as
             "label" : str
                 Column label for the data.
+    known_data : dict, optional
+        Output of `fill_known_bytes` for `packet`.  If provided, known values
+        are taken from it rather than decoded again.
 
     Returns
     -------
@@ -491,29 +1927,21 @@ def decode_packet(packet, dtype, starting_byte, packet_length=PACKET_LENGTH,
         Data from `packet` decoded into `dtype` (or knowns).
         Byte idx => {label: label (str), val: val (various)}
     """
-    nbytes = get_nbytes(dtype)
-
-    if known_data is None:
-        data = fill_known_bytes(packet, knowns, packet_length=packet_length)
-    else:
-        data = deepcopy(known_data)
-
-    # Handle already populated bytes or reservered/wasted bytes.
-    known_bytes = _get_known_bytes(knowns)
-    first_bytes = _get_first_bytes(starting_byte, nbytes, packet_length=packet_length)
-    wasted_bytes = _get_wasted_bytes(starting_byte, nbytes, knowns, packet_length=packet_length, known_bytes=known_bytes, first_bytes=first_bytes)
-    filled_bytes = _get_filled_bytes(starting_byte, nbytes, knowns, packet_length=packet_length, known_bytes=known_bytes, first_bytes=first_bytes, wasted_bytes=wasted_bytes)
-
-    # Populate filler bytes
-    for byte_idx in wasted_bytes:
-        data[byte_idx] = {"val": WASTED_BYTE}
-
-    for byte_idx in filled_bytes:
-        data[byte_idx] = {"val": FILLED_BYTE}
-
-    # Parse available values
-    for byte_idx in first_bytes:
-        if byte_idx in filled_bytes:
+    # The layout of known, wasted and filled bytes is shared by all packets.
+    plan = get_layout_plan(dtype, starting_byte, knowns, packet_length=packet_length)
+
+    data = {}
+    for byte_idx, kind, entry in plan.rows:
+        if kind == "static":
+            data[byte_idx] = dict(entry)
+        elif kind == "known":
+            known_dtype, label = entry
+            data[byte_idx] = {
+                "val": decode_bytes(packet, byte_idx, known_dtype)
+                    if known_data is None else known_data[byte_idx]["val"],
+                "label": label
+            }
+        else:
             data[byte_idx] = {
                 "val": decode_bytes(packet, byte_idx, dtype),
                 "label": FILLED_BYTE
@@ -710,6 +2138,563 @@ def _get_first_bytes(starting_byte, nbytes, packet_length=PACKET_LENGTH):
     return list(range(starting_byte, packet_length, nbytes))
 
 
+PacketLengthCandidate = namedtuple("PacketLengthCandidate", ["packet_length",
+        "confidence"])
+
+
+def detect_packet_length(filepath, max_len=64, min_len=2,
+        sample_bytes=DETECT_SAMPLE_BYTES, start_byte=START_BYTE, ncandidates=5):
+    """Returns the most likely packet lengths of the file at `filepath`.
+
+    Scores each candidate period over a sample of the byte stream, starting
+    at the end of the header (if found), with:
+        * the autocorrelation of the bytes at a lag of the period, i.e. the
+          fraction of bytes equal to the byte one period later,
+        * the mean purity of the sample folded at the period, i.e. how often
+          each position in a packet holds its most common value, and
+        * the periodicity of `start_byte`, i.e. the largest fraction of
+          packets holding `start_byte` at the same position.
+    Multiples of the packet length score as well as the packet length itself,
+    so candidates scoring no better than one of their divisors are demoted.
+
+    The sample is bounded by `sample_bytes`, so the cost does not depend on
+    the size of the file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to file to parse.
+    max_len : int
+        Longest packet length considered.
+    min_len : int
+        Shortest packet length considered.
+    sample_bytes : int
+        Number of bytes sampled.
+    start_byte : int or None
+        Value expected at a fixed position of every packet.  None to score
+        periodicity alone.
+    ncandidates : int
+        Number of candidates returned.
+
+    Returns
+    -------
+    candidates : list of PacketLengthCandidate
+        Sorted from most to least likely.  Confidence is between 0 (no better
+        than any other period) and 1.
+
+    Raises
+    ------
+    DecoderRingError : if the sample is too short for `min_len`.
+    """
+    # As `DataDecoder`, start bytes only end a header which parses.
+    offset, _ = read_header(filepath)
+    if offset is None:
+        offset = 0
+
+    sample = read_packets(filepath, np.uint8, offset=offset, count=sample_bytes)
+
+    scores = {}
+    for packet_length in range(min_len, max_len + 1):
+        npackets = len(sample) // packet_length
+        if npackets < 2:
+            break
+
+        packets = sample[:npackets * packet_length].reshape(npackets, packet_length)
+
+        # Count each value at each position of the folded sample.
+        counts = np.bincount(
+            (np.arange(packet_length) * 256 + packets).ravel(),
+            minlength=packet_length * 256
+        ).reshape(packet_length, 256)
+
+        components = [
+            np.mean(sample[:-packet_length] == sample[packet_length:]),
+            np.mean(counts.max(axis=1)) / npackets,
+        ]
+        if start_byte is not None:
+            components.append(counts[:, start_byte].max() / npackets)
+
+        scores[packet_length] = np.mean(components)
+
+    if not scores:
+        raise DecoderRingError(
+            "Too few bytes in {} to detect the packet length.".format(filepath)
+        )
+
+    # Normalize against the typical (aperiodic) score.
+    baseline = np.median(list(scores.values()))
+    confidence = {packet_length: max(score - baseline, 0) / max(1 - baseline, 1e-12)
+            for packet_length, score in scores.items()}
+
+    # Demote multiples which do not score better than a divisor.
+    for packet_length, score in scores.items():
+        divisors = [d for d in scores if d < packet_length and
+                packet_length % d == 0 and scores[d] >= score - 0.05]
+        if divisors:
+            confidence[packet_length] *= min(divisors) / packet_length
+
+    ranked = sorted(confidence, key=lambda x: (-confidence[x], x))
+
+    return [PacketLengthCandidate(packet_length, float(confidence[packet_length]))
+            for packet_length in ranked[:ncandidates]]
+
+
+def find_data_offset(filepath, start_bytes=START_BYTES,
+        max_header_bytes=MAX_HEADER_BYTES, buffer=None):
+    """Returns the byte position just after the header, i.e. of the first packet.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to file to parse.
+    start_bytes : bytearray
+        Bytes indicating the end of the header, start of the data.
+    max_header_bytes : int
+        Number of bytes searched for `start_bytes`.
+    buffer : buffer, optional
+        Contents of `filepath` (e.g. a memory-map).
+
+    Returns
+    -------
+    offset : int or None
+        None if `start_bytes` is not found.
+    """
+    if buffer is not None:
+        idx = buffer.find(bytes(start_bytes), 0, max_header_bytes)
+    else:
+        with open(filepath, "rb") as f:
+            idx = f.read(max_header_bytes).find(bytes(start_bytes))
+
+    if idx < 0:
+        return None
+
+    return idx + len(start_bytes)
+
+
+def read_header(filepath, start_bytes=START_BYTES,
+        max_header_bytes=MAX_HEADER_BYTES, buffer=None):
+    """Returns the byte position of the first packet and the header metadata.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to file to parse.
+    start_bytes : bytearray
+        Bytes indicating the end of the header, start of the data.
+    max_header_bytes : int
+        Number of bytes searched for `start_bytes`.
+    buffer : buffer, optional
+        Contents of `filepath` (e.g. a memory-map).
+
+    Returns
+    -------
+    offset : int or None
+        None if there is no header.  See `find_data_offset`.
+    header : packet_map.Header or None
+        None if there is no header.
+
+    Notes
+    -----
+    Packets may contain `start_bytes` (e.g. a uint32le dpt of 426 after a
+    start byte), so bytes before them only count as a header if they are of
+    the format written by `packet_map.get_header_bytes`.
+    """
+    offset = find_data_offset(filepath, start_bytes=start_bytes,
+            max_header_bytes=max_header_bytes, buffer=buffer)
+
+    if offset is None:
+        return None, None
+
+    if buffer is not None:
+        header_bytes = buffer[:offset]
+    else:
+        with open(filepath, "rb") as f:
+            header_bytes = f.read(offset)
+
+    try:
+        return offset, parse_header_bytes(header_bytes, start_bytes=start_bytes)
+    except DecoderRingError:
+        return None, None
+
+
+def map_file(filepath):
+    """Returns a read-only memory-map of the file at `filepath`.
+
+    Raises
+    ------
+    DecoderRingError : if the file is empty (and so can not be mapped).
+    """
+    with open(filepath, "rb") as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise DecoderRingError("Can not memory-map empty file {}.".format(filepath))
+
+
+def read_packets(filepath, dtype, offset=0, count=-1, buffer=None, step=1):
+    """Reads `count` packets of `dtype` from `filepath`, starting at `offset`.
+
+    If `buffer` is provided (e.g. output of `map_file`), packets are returned
+    as a zero-copy view over it rather than read from `filepath`.  With a
+    `step`, only every `step`th packet is read: a strided view of `buffer`, or
+    read from the file as records padded to `step` packets.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to file to read.
+    dtype : np.dtype
+        Data-type of a single packet (e.g. output of `lib.get_packet_dtype`).
+    offset : int
+        Byte position of the first packet.
+    count : int
+        Number of packets to read.  -1 reads to the end of the file.
+    buffer : buffer, optional
+        Contents of `filepath` (e.g. a memory-map).
+    step : int
+        Number of packets from one packet read to the next.
+
+    Returns
+    -------
+    records : np.array(dtype)
+
+    Raises
+    ------
+    DecoderRingError : if `offset` is outside of the file, or `step` < 1.
+    """
+    if offset < 0:
+        raise DecoderRingError(
+            "Invalid offset {}; more packets requested than in file.".format(offset)
+        )
+
+    if step < 1:
+        raise DecoderRingError("Invalid step {}.".format(step))
+
+    if step > 1:
+        return _read_strided_packets(filepath, np.dtype(dtype), offset, count,
+                buffer, step)
+
+    if buffer is not None:
+        dtype = np.dtype(dtype)
+        available = max(len(buffer) - offset, 0) // dtype.itemsize
+        count = available if count < 0 else min(count, available)
+
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+
+    with open(filepath, "rb") as f:
+        return np.fromfile(f, dtype=dtype, count=count, offset=offset)
+
+
+def _bisect_left(get_value, value, n):
+    """Returns the first position in [0, n) with `get_value(position)` >= `value`.
+
+    `get_value` must be non-decreasing; n if no position qualifies.
+    """
+    lo, hi = 0, n
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if get_value(mid) < value:
+            lo = mid + 1
+        else:
+            hi = mid
+
+    return lo
+
+
+def _read_strided_packets(filepath, dtype, offset, count, buffer, step):
+    """Reads every `step`th packet; see `read_packets`."""
+    stride = step * dtype.itemsize
+
+    if buffer is not None:
+        size = len(buffer)
+    else:
+        size = get_filesize(filepath)
+
+    # The last packet read needs only its own bytes, not a full stride.
+    available = max(size - offset - dtype.itemsize, -1) // stride + 1
+    count = available if count < 0 else min(count, available)
+
+    if count <= 0:
+        return np.empty(0, dtype=dtype)
+
+    if buffer is not None:
+        return np.frombuffer(buffer, dtype=dtype, count=(count - 1) * step + 1,
+                offset=offset)[::step]
+
+    padded = np.dtype([("packet", dtype), ("gap", "V{}".format(stride - dtype.itemsize))])
+    with open(filepath, "rb") as f:
+        records = np.fromfile(f, dtype=padded, count=count - 1, offset=offset)["packet"]
+        last = np.fromfile(f, dtype=dtype, count=1)
+
+    return np.concatenate([records, last])
+
+
+def decode_records(records, knowns):
+    """Returns the known fields of `records`, scaled by their factors.
+
+    Parameters
+    ----------
+    records : np.array
+        Packets read with the structured data-type of `knowns`.  See
+        `lib.get_packet_dtype`.
+    knowns : dict
+        Portions of the byte map that are known.  Key is starting byte idx.
+        Value is a dict containing, at least:
+            "dtype" : str
+                Datatype bytes should be parsed as
+            "label" : str
+                Column label for the data.
+            "factor" : float, optional
+                Values are divided by factor when decoded.
+
+    Returns
+    -------
+    columns : dict
+        Label to np.array(float64) of decoded values.
+    """
+    if knowns is None:
+        knowns = {}
+
+    return {
+        byte_dict["label"]: np.divide(records[byte_dict["label"]],
+                byte_dict.get("factor", 1), dtype=np.float64)
+        for byte_dict in knowns.values()
+    }
+
+
+ResyncResult = namedtuple("ResyncResult", ["data", "valid", "skipped"])
+ResyncResult.__doc__ = """Packets decoded by `DataDecoder.resync_knowns`.
+
+Attributes
+----------
+data : pd.DataFrame
+    Decoded knowns, one row per packet found.
+valid : np.array(bool)
+    Whether each packet is valid; see `locate_packets`.
+skipped : list of (int, int)
+    Byte ranges [start, stop) of the file not in any packet.
+"""
+
+
+def locate_packets(data, packet_length, start_byte=START_BYTE, dpt_index=None,
+        dpt_dtype=None, confirm=RESYNC_CONFIRM):
+    """Returns the byte position of every packet in `data`, skipping corruption.
+
+    Starting from the first valid packet, packets are validated a block at a
+    time: each must begin with `start_byte` and, if `dpt_index` is given, have
+    a dpt one more than the previous packet.  At the first invalid packet, the
+    next packet is taken from the following `start_byte` which is confirmed by
+    `confirm` more start bytes, one packet apart (i.e. the stream is
+    resynchronized).  A clean stream is validated in one vectorized pass.
+
+    Packets are invalid if the next packet starts before they end (i.e. they
+    were truncated by dropped bytes) or, if `dpt_index` is given, their dpt
+    does not continue the count of either neighbour.
+
+    Parameters
+    ----------
+    data : np.array(uint8)
+        Byte stream, starting at (or before) the first packet.
+    packet_length : int
+        Number of bytes in each packet.
+    start_byte : int
+        Value of the first byte of each packet.
+    dpt_index : int, optional
+        Starting byte of the dpt field.
+    dpt_dtype : str, optional
+        Data-type of the dpt field.
+    confirm : int
+        Number of following start bytes confirming a resynchronization.
+
+    Returns
+    -------
+    starts : np.array(int)
+        Byte position in `data` of each packet.
+    valid : np.array(bool)
+        Whether each packet is valid.
+    skipped : list of (int, int)
+        Byte ranges [start, stop) of `data` not in any packet.
+    """
+    dpt = (dpt_index, dpt_dtype) if dpt_index is not None else None
+
+    runs, truncated, skipped = [], [], []
+    npackets = 0
+
+    pos = _find_anchor(data, 0, packet_length, start_byte, confirm)
+    if pos is None:
+        pos = len(data)
+
+    if pos > 0:
+        skipped.append((0, pos))
+
+    while pos < len(data):
+        nrun = _get_run_length(data, pos, packet_length, start_byte, dpt)
+        runs.append(pos + packet_length * np.arange(nrun))
+        npackets += nrun
+
+        # Prefer the next packet where it is expected.
+        end = pos + nrun * packet_length
+        last = end - packet_length
+        if _is_anchor(data, end, packet_length, start_byte, confirm):
+            pos = end
+        else:
+            pos = _find_anchor(data, last + 1, packet_length, start_byte, confirm)
+
+        if pos is None:
+            if end < len(data):
+                skipped.append((end, len(data)))
+            break
+
+        if pos < end:
+            truncated.append(npackets - 1)
+        elif pos > end:
+            skipped.append((end, pos))
+
+    starts = np.concatenate(runs) if runs else np.empty(0, dtype=np.int64)
+
+    valid = np.ones(len(starts), dtype=bool)
+    valid[truncated] = False
+
+    # Packets within a run already continue the count; only check across runs.
+    if (dpt is not None) and (len(runs) > 1):
+        values = _gather_values(data, starts, dpt_index, dpt_dtype,
+                packet_length).astype(np.int64)
+        continues = np.diff(values) == 1
+
+        consistent = np.zeros(len(starts), dtype=bool)
+        consistent[1:] |= continues
+        consistent[:-1] |= continues
+        valid &= consistent
+
+    return starts, valid, skipped
+
+
+def gather_packets(data, starts, dtype):
+    """Returns the packets of `dtype` starting at each of `starts` in `data`.
+
+    Evenly spaced packets are returned as a zero-copy view over `data`;
+    otherwise each evenly spaced run of packets is viewed and the runs are
+    concatenated, so no more than the packets themselves are copied.
+
+    Parameters
+    ----------
+    data : np.array(uint8)
+        Byte stream.
+    starts : np.array(int)
+        Byte position in `data` of each packet.
+    dtype : np.dtype
+        Data-type of a single packet (e.g. output of `lib.get_packet_dtype`).
+
+    Returns
+    -------
+    records : np.array(dtype)
+    """
+    dtype = np.dtype(dtype)
+
+    if not len(starts):
+        return np.empty(0, dtype=dtype)
+
+    runs = _view_runs(data, starts, dtype)
+    if len(runs) == 1:
+        return runs[0]
+
+    return np.concatenate(runs)
+
+
+def _view_runs(data, starts, dtype):
+    """Returns a view over `data` of each evenly spaced run of packets at `starts`."""
+    breaks = np.flatnonzero(np.diff(starts) != dtype.itemsize) + 1
+    bounds = np.concatenate([[0], breaks, [len(starts)]])
+
+    return [data[starts[lo]:starts[lo] + (hi - lo) * dtype.itemsize].view(dtype)
+            for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def _gather_values(data, starts, byte_idx, dtype, packet_length):
+    """Returns the field of `dtype` at `byte_idx` of the packets at `starts`."""
+    field = np.dtype({
+        "names": ["value"],
+        "formats": [DATA_TYPES[dtype]],
+        "offsets": [byte_idx],
+        "itemsize": packet_length,
+    })
+
+    return np.concatenate([run["value"] for run in _view_runs(data, starts, field)])
+
+
+def _get_run_length(data, pos, packet_length, start_byte, dpt=None):
+    """Returns the number of consecutive valid packets from `pos` (at least 1).
+
+    See `locate_packets`.
+    """
+    total = (len(data) - pos) // packet_length
+    prev = None
+
+    for block_start in range(0, total, RESYNC_BLOCK):
+        nblock = min(RESYNC_BLOCK, total - block_start)
+        offset = pos + block_start * packet_length
+        block = data[offset:offset + nblock * packet_length].reshape(nblock,
+                packet_length)
+
+        ok = block[:, 0] == start_byte
+
+        if dpt is not None:
+            byte_idx, dtype = dpt
+            values = np.ascontiguousarray(
+                block[:, byte_idx:byte_idx + get_nbytes(dtype)]
+            ).view(DATA_TYPES[dtype])[:, 0].astype(np.int64)
+
+            if prev is not None:
+                ok[0] &= values[0] == prev + 1
+            ok[1:] &= np.diff(values) == 1
+            prev = values[-1]
+
+        # The packet at `pos` is valid by construction.
+        if block_start == 0:
+            ok[0] = True
+
+        if not ok.all():
+            return block_start + int(np.argmin(ok))
+
+    return max(total, 1)
+
+
+def _is_anchor(data, pos, packet_length, start_byte, confirm):
+    """Returns whether a packet starting at `pos` is confirmed by start bytes."""
+    return _find_anchor(data, pos, packet_length, start_byte, confirm,
+            stop=pos + 1) == pos
+
+
+def _find_anchor(data, lo, packet_length, start_byte, confirm, stop=None):
+    """Returns the first position from `lo` that can start a packet, or None.
+
+    A position can start a packet if it holds `start_byte`, as do the
+    `confirm` following packets (as far as they fit in `data`).
+    """
+    last = len(data) - packet_length + 1
+    stop = last if stop is None else min(stop, last)
+
+    while lo < stop:
+        hi = min(lo + RESYNC_WINDOW, stop)
+        candidates = np.flatnonzero(data[lo:hi] == start_byte) + lo
+
+        ok = np.ones(len(candidates), dtype=bool)
+        for i in range(1, confirm + 1):
+            following = candidates + i * packet_length
+            fits = following < last
+            ok &= ~fits | (data[np.where(fits, following, 0)] == start_byte)
+
+        if ok.any():
+            return int(candidates[ok][0])
+
+        lo = hi
+
+    return None
+
+
 def get_packet(byte_stream, n, packet_length=PACKET_LENGTH):
     """Returns the bytes from the nth from the end data-packet.
 
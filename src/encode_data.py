@@ -2,21 +2,57 @@
 Module to write data to file
 """
 import os
+import queue
 import datetime
+import threading
+from collections import namedtuple
+from warnings import warn
 from dateutil.parser import parse
 import numpy as np
+import pandas as pd
 
 # Local imports
-from .lib import DecoderRingError, DATA_TYPES, cast_to_bytes
+from .lib import DecoderRingError, DATA_TYPES, get_nbytes, get_packet_dtype
 from .packet_map import PACKET_MAP, get_header_bytes
-from .sample_data import create_data
+from .sample_data import create_data, iter_data
 
 DT = parse("20200317 10:00:00")
 
+# Number of rows encoded and written at a time.
+ENCODE_CHUNK_ROWS = 1000000
 
-def encode_data(filepath, df, start_time, packet_map=PACKET_MAP):
+# Ways of handling values which do not fit their data-type when encoding: raise
+# a DecoderRingError, clip them to the data-type, or warn of them (on close).
+VALIDATE_MODES = ("raise", "clip", "report")
+
+# Distance from the nearest integer, in units of the encoded integer, beyond
+# which a scaled value loses precision (beside floating-point rounding error).
+PRECISION_TOLERANCE = 1e-6
+
+# Values of a field which did not fit its data-type when encoded.  `first_row`
+# is the packet position of the first of them.
+EncodingIssue = namedtuple("EncodingIssue", ["label", "overflows",
+        "precision_losses", "first_row"])
+
+# Number of rows parsed from a csv at a time when transcoding.
+CSV_CHUNK_ROWS = 250000
+
+# Number of parsed chunks waiting to be encoded, bounding transcoding memory.
+TRANSCODE_QUEUE_SIZE = 2
+
+# Seconds between checks, while blocked, for the other end of the transcoding
+# pipeline failing.
+TRANSCODE_POLL_INTERVAL = 0.1
+
+
+def encode_data(filepath, df, start_time, packet_map=PACKET_MAP, validate=None):
     """Encodes and writes data to a file along with the header.
 
+    Each packet is laid out by a structured data-type built from `packet_map`
+    (bytes not in the map are zero).  Columns are scaled and cast a chunk of
+    `ENCODE_CHUNK_ROWS` rows at a time, and each chunk is written at once.
+    See `PacketWriter` to write data batch by batch, and for `validate`.
+
     Parameters
     ----------
     filepath : str
@@ -34,6 +70,8 @@ def encode_data(filepath, df, start_time, packet_map=PACKET_MAP):
                 Column name in `df` containing the data.
             "factor" : float, optional
                 Multiplicative factor when encoding `df[label]` as bytes.
+    validate : str, optional
+        One of `VALIDATE_MODES`, to check values fit their data-types.
 
     Returns
     -------
@@ -41,21 +79,446 @@ def encode_data(filepath, df, start_time, packet_map=PACKET_MAP):
 
     Raises
     ------
-    DecoderRingError
+    DecoderRingError : for columns missing from `df`, an invalid
+    `packet_map`, or (validating with "raise") values which do not fit.
+    """
+    _check_columns(df, packet_map)
+
+    with PacketWriter(filepath, start_time, packet_map=packet_map,
+            validate=validate) as writer:
+        writer.append(df)
+
+
+class PacketWriter(object):
+    """Writes packets to a file batch by batch, e.g. from a simulator.
+
+    The header is written once, on opening.  Each appended batch is encoded
+    into a reusable buffer of `flush_rows` packets, which is written whenever
+    it fills (or on `flush`), so memory use does not grow with the file.
+
+    By default, values are cast as `lib.cast_to_bytes`: floats are truncated
+    to integers, and values out of range wrap.  With `validate`, every column
+    of each batch is checked at once: integers are rounded to the nearest,
+    and values out of range (or NaN) or more than `PRECISION_TOLERANCE` from
+    an integer once scaled are raised, clipped (NaNs to 0) or reported,
+    according to the mode.  Floats are checked for overflow only.
+    """
+
+    def __init__(self, filepath, start_time, packet_map=PACKET_MAP,
+            flush_rows=ENCODE_CHUNK_ROWS, validate=None):
+        """Opens `filepath` and writes the header.
+
+        Parameters
+        ----------
+        filepath : str
+            Path to file to write.
+        start_time : datetime.datetime
+            Datetime of first datapoint.
+        packet_map : dict
+            See `encode_data`.
+        flush_rows : int
+            Number of packets buffered before they are written.  The buffer
+            grows as packets are appended, up to this size.
+        validate : str, optional
+            One of `VALIDATE_MODES`.  Defaults to no validation.
+
+        Raises
+        ------
+        DecoderRingError : for an invalid `packet_map`, `flush_rows` or
+        `validate`.
+        """
+        if flush_rows < 1:
+            raise DecoderRingError("Invalid flush_rows {}.".format(flush_rows))
+
+        if (validate is not None) and (validate not in VALIDATE_MODES):
+            raise DecoderRingError("Invalid validate {}; must be one of {}.".format(
+                    validate, VALIDATE_MODES))
+
+        self._packet_map = packet_map
+        self._flush_rows = flush_rows
+        self._validate = validate
+        self._issues = {}
+        self._buffer = np.zeros(0, dtype=get_packet_dtype(packet_map,
+                _get_packet_length(packet_map)))
+        self._nbuffered = 0
+        self._npackets = 0
+
+        self._file = open(filepath, "wb")
+        self._file.write(get_header_bytes(os.path.split(filepath)[-1], start_time))
+
+    @property
+    def npackets(self):
+        """Number of packets appended."""
+        return self._npackets
+
+    @property
+    def issues(self):
+        """List of EncodingIssue of the values validated so far."""
+        return list(self._issues.values())
+
+    def append(self, data):
+        """Encodes a batch of rows.
+
+        Parameters
+        ----------
+        data : pd.DataFrame or dict
+            Columns (or label to array) matching the labels in the packet map.
+
+        Raises
+        ------
+        DecoderRingError : if the writer is closed, for missing columns or
+        columns of different lengths, or (validating with "raise") values
+        which do not fit their data-types.  Rows of the batch before the
+        chunk with such values are still written.
+        """
+        if self._file is None:
+            raise DecoderRingError("Cannot append to a closed PacketWriter.")
+
+        _check_columns(data, self._packet_map)
+
+        columns = {byte_dict["label"]: np.asarray(data[byte_dict["label"]]) for
+                byte_dict in self._packet_map.values()}
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise DecoderRingError("Columns must be of the same length.")
+        nrows = lengths.pop() if lengths else 0
+        self._reserve(nrows)
+
+        start = 0
+        while start < nrows:
+            count = min(nrows - start, self._flush_rows - self._nbuffered)
+            records = self._buffer[self._nbuffered:self._nbuffered + count]
+
+            issues = []
+            for byte_dict in self._packet_map.values():
+                values = columns[byte_dict["label"]][start:start + count]
+                values = values * byte_dict.get("factor", 1)
+
+                if self._validate is not None:
+                    values, overflows, losses = _check_values(values,
+                            DATA_TYPES[byte_dict["dtype"]],
+                            clip=self._validate == "clip")
+
+                    if overflows.any() or losses.any():
+                        issues.append(EncodingIssue(
+                            byte_dict["label"],
+                            int(overflows.sum()),
+                            int(losses.sum()),
+                            self._npackets + int(np.argmax(overflows | losses))
+                        ))
+
+                # Otherwise cast as `lib.cast_to_bytes`, i.e. floats truncated
+                # to ints.  Invalid casts are reported by the validation.
+                with np.errstate(invalid="warn" if self._validate is None else "ignore"):
+                    records[byte_dict["label"]] = values
+
+            if issues and (self._validate == "raise"):
+                raise DecoderRingError("Values do not fit their data-types: {}".format(
+                        issues))
+            self._add_issues(issues)
+
+            # Counted as buffered, so that rows before an error are counted.
+            self._nbuffered += count
+            self._npackets += count
+            start += count
+
+            if self._nbuffered == self._flush_rows:
+                self._write_buffer()
+
+    def flush(self):
+        """Writes the buffered packets, so readers of the file see them."""
+        if self._file is not None:
+            self._write_buffer()
+            self._file.flush()
+
+    def close(self):
+        """Writes the buffered packets and closes the file.
+
+        Validating with "report", warns of any values which did not fit.
+        """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+            if self._issues and (self._validate == "report"):
+                warn("Values did not fit their data-types: {}".format(self.issues))
+
+    def _add_issues(self, issues):
+        """Adds the issues of a chunk to those of the previous chunks."""
+        for issue in issues:
+            previous = self._issues.get(issue.label)
+
+            if previous is not None:
+                issue = EncodingIssue(issue.label,
+                        previous.overflows + issue.overflows,
+                        previous.precision_losses + issue.precision_losses,
+                        previous.first_row)
+            self._issues[issue.label] = issue
+
+    def _reserve(self, nrows):
+        """Grows the buffer to hold `nrows` more packets, up to `flush_rows`."""
+        size = min(self._nbuffered + nrows, self._flush_rows)
+        if len(self._buffer) >= size:
+            return
+
+        # Grown geometrically, so that many small batches are not copied often.
+        buffer = np.zeros(max(size, min(2 * len(self._buffer), self._flush_rows)),
+                dtype=self._buffer.dtype)
+        buffer[:self._nbuffered] = self._buffer[:self._nbuffered]
+        self._buffer = buffer
+
+    def _write_buffer(self):
+        """Writes the buffered packets to the file."""
+        self._buffer[:self._nbuffered].tofile(self._file)
+        self._nbuffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def transcode_csv(csv_file, filepath, start_time, packet_map=PACKET_MAP,
+        chunk_rows=CSV_CHUNK_ROWS, validate=None):
+    """Encodes a csv (e.g. `sample.csv`) to a file, in constant memory.
+
+    The csv is parsed `chunk_rows` at a time, with explicit data-types and
+    only the columns in `packet_map`, by a producer thread, while each parsed
+    chunk is encoded and written by a `PacketWriter`.  Parsing and encoding
+    overlap (both release the GIL for much of their work), and at most
+    `TRANSCODE_QUEUE_SIZE` chunks wait between them.
+
+    Parameters
+    ----------
+    csv_file : str
+        Path to the csv to encode.  It should contain columns matching those
+        found in `packet_map`.
+    filepath : str
+        Path to file to write.
+    start_time : datetime.datetime
+        Datetime of first datapoint.
+    packet_map : dict
+        See `encode_data`.
+    chunk_rows : int
+        Number of rows parsed at a time.
+    validate : str, optional
+        See `PacketWriter`.
+
+    Returns
+    -------
+    npackets : int
+        Number of packets written.
+
+    Raises
+    ------
+    DecoderRingError : for columns missing from the csv, an invalid
+    `packet_map`, or (validating with "raise") values which do not fit.
     """
-    header_bytes = get_header_bytes(os.path.split(filepath)[-1],
-            start_time)
-
-    with open(filepath, "wb") as f:
-        f.write(header_bytes)
-        for _, row in df.iterrows():
-            for _, byte_dict in PACKET_MAP.items():
-                f.write(
-                    cast_to_bytes(
-                        row[byte_dict["label"]] * byte_dict.get("factor", 1),
-                        byte_dict["dtype"]
-                    )
-                )
+    _check_columns(pd.read_csv(csv_file, nrows=0).columns, packet_map)
+
+    chunks = queue.Queue(maxsize=TRANSCODE_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def parse_chunks():
+        # Puts each parsed chunk, then None when done, or the error raised.
+        try:
+            for chunk_df in pd.read_csv(csv_file, usecols=list(_get_csv_dtypes(
+                    packet_map)), dtype=_get_csv_dtypes(packet_map),
+                    chunksize=chunk_rows, engine="c"):
+                if not _put_unless_stopped(chunks, chunk_df, stop):
+                    return
+            _put_unless_stopped(chunks, None, stop)
+        except Exception as e:
+            _put_unless_stopped(chunks, e, stop)
+
+    producer = threading.Thread(target=parse_chunks, daemon=True)
+    producer.start()
+
+    try:
+        with PacketWriter(filepath, start_time, packet_map=packet_map,
+                flush_rows=chunk_rows, validate=validate) as writer:
+            while True:
+                chunk_df = chunks.get()
+
+                if chunk_df is None:
+                    break
+                if isinstance(chunk_df, Exception):
+                    raise chunk_df
+
+                writer.append(chunk_df)
+    finally:
+        stop.set()
+        producer.join()
+
+    return writer.npackets
+
+
+def encode_synthetic_data(filepath, start_time, ncycles, packet_map=PACKET_MAP,
+        validate=None, **data_kwargs):
+    """Encodes synthetic data (see `sample_data.iter_data`) to a file.
+
+    The data are generated and written one chunk at a time, so files of any
+    size (e.g. multi-GB fixtures for performance tests) are written in
+    constant memory.  Note the "time" of `PACKET_MAP` only holds ~429,000
+    seconds (~859,000 rows at the default `dt`); pass a smaller `dt` (the
+    time jitter scales with it) or a packet map with a wider time for longer
+    data.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to file to write.
+    start_time : datetime.datetime
+        Datetime of first datapoint.
+    ncycles : int
+        Number of cycles of synthetic data.
+    packet_map : dict
+        See `encode_data`.
+    validate : str, optional
+        See `PacketWriter`.
+    **data_kwargs
+        Passed to `sample_data.iter_data` (e.g. `step_points` or `seed`).
+
+    Returns
+    -------
+    npackets : int
+        Number of packets written.
+
+    Raises
+    ------
+    DecoderRingError : for invalid `data_kwargs`, or data which do not fit
+    `packet_map` (see `sample_data.iter_data`).  The file is not written.
+    """
+    # Checked before the file is opened.
+    chunks = iter_data(ncycles, packet_map=packet_map, **data_kwargs)
+
+    with PacketWriter(filepath, start_time, packet_map=packet_map,
+            validate=validate) as writer:
+        for chunk_df in chunks:
+            writer.append(chunk_df)
+
+    return writer.npackets
+
+
+def _put_unless_stopped(chunks, item, stop):
+    """Puts `item` on the `chunks` queue, unless `stop` is set while waiting.
+
+    Returns
+    -------
+    put : bool
+    """
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=TRANSCODE_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+
+def _get_csv_dtypes(packet_map):
+    """Returns the data-type to parse each column of `packet_map` from a csv.
+
+    Values are parsed as floats (integers may be written as e.g. "1.0"),
+    except for unscaled 64-bit integers and bools, which floats can not hold
+    exactly.
+    """
+    dtypes = {}
+    for byte_dict in packet_map.values():
+        dtype = DATA_TYPES[byte_dict["dtype"]]
+
+        if (dtype.kind == "b") or ((dtype.kind in "iu") and (dtype.itemsize == 8) and
+                ("factor" not in byte_dict)):
+            dtypes[byte_dict["label"]] = dtype.newbyteorder("=")
+        else:
+            dtypes[byte_dict["label"]] = np.float64
+
+    return dtypes
+
+
+def _check_values(values, dtype, clip=False):
+    """Checks scaled values fit a data-type, all at once.
+
+    Parameters
+    ----------
+    values : np.array
+        Scaled values of a field.
+    dtype : np.dtype
+        Data-type the values are encoded as.
+    clip : bool
+        Whether to clip values out of range (and NaNs to 0).
+
+    Returns
+    -------
+    values : np.array
+        Values to encode; integers rounded to the nearest.
+    overflows : np.array(bool)
+        True for values out of range (or NaN, for integers).
+    losses : np.array(bool)
+        True for values more than `PRECISION_TOLERANCE` from an integer.
+    """
+    no_issues = np.zeros(len(values), dtype=bool)
+
+    if dtype.kind in "iu":
+        info = np.iinfo(dtype)
+
+        if values.dtype.kind in "iu":
+            overflows = (values < info.min) | (values > info.max)
+            losses = no_issues
+        else:
+            values = values.astype(np.float64, copy=False)
+            rounded = np.rint(values)
+
+            # NaNs compare False, so are overflows.  The extremes are checked
+            # first, as values nearly always fit.
+            overflows = no_issues
+            if not ((rounded.min(initial=0) >= info.min) and
+                    (rounded.max(initial=0) <= info.max)):
+                overflows = ~((rounded >= info.min) & (rounded <= info.max))
+
+            # Beyond the tolerance, floating-point error (a few units in the last
+            # place) is only possible for values too large to be exact anyway.
+            errors = np.abs(values - rounded)
+            losses = errors > PRECISION_TOLERANCE
+            if losses.any():
+                losses[losses] = errors[losses] > 4 * np.spacing(np.abs(values[losses]))
+
+            values = rounded
+            if clip:
+                values = np.nan_to_num(values, nan=0)
+
+        if clip:
+            values = np.clip(values, info.min, info.max)
+
+        return values, overflows, losses
+
+    if dtype.kind == "f":
+        info = np.finfo(dtype)
+        overflows = np.isfinite(values) & (np.abs(values) > info.max)
+
+        if clip:
+            values = np.where(overflows, np.sign(values) * info.max, values)
+
+        return values, overflows, no_issues
+
+    return values, no_issues, no_issues
+
+
+def _check_columns(data, packet_map):
+    """Raises a DecoderRingError if `data` lacks columns of `packet_map`."""
+    missing = [byte_dict["label"] for byte_dict in packet_map.values() if
+            byte_dict["label"] not in data]
+    if missing:
+        raise DecoderRingError("Columns {} are not in the data.".format(missing))
+
+
+def _get_packet_length(packet_map):
+    """Returns the number of bytes in a packet laid out by `packet_map`."""
+    return max([byte_idx + get_nbytes(byte_dict["dtype"]) for byte_idx, byte_dict in
+            packet_map.items()], default=0)
 
 
 def main(dt=None):
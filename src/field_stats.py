@@ -0,0 +1,151 @@
+"""
+Module for streaming statistics of decoded fields, mergeable across chunks
+"""
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from functools import reduce
+
+# Statistics of a sequence of values of one field.  `m2` is the sum of squared
+# deviations from the mean; `first` and `last` are the first and last values,
+# kept so that `transitions` (changes from one value to the next) can be
+# counted across the boundary of merged sequences.  NaNs are excluded from the
+# count, mean, m2, min and max.
+FieldStats = namedtuple("FieldStats", ["count", "mean", "m2", "min", "max",
+        "first", "last", "transitions"])
+
+# Statistics of no values.
+EMPTY_STATS = FieldStats(0, 0.0, 0.0, np.nan, np.nan, None, None, 0)
+
+
+def compute_stats(values):
+    """Returns the statistics of a sequence of values.
+
+    Parameters
+    ----------
+    values : np.array
+        1-d array of values.
+
+    Returns
+    -------
+    stats : FieldStats
+    """
+    values = np.asarray(values)
+    if not len(values):
+        return EMPTY_STATS
+
+    transitions = int(np.count_nonzero(values[1:] != values[:-1]))
+    first, last = values[0].item(), values[-1].item()
+
+    if values.dtype.kind == "f":
+        values = values[~np.isnan(values)]
+
+    if not len(values):
+        return EMPTY_STATS._replace(first=first, last=last, transitions=transitions)
+
+    # Sums are pairwise in numpy, and deviations are taken from the mean of
+    # the chunk, so the result is stable for long chunks.
+    values = values.astype(np.float64)
+    mean = values.mean()
+
+    return FieldStats(
+        count=len(values),
+        mean=float(mean),
+        m2=float(np.square(values - mean).sum()),
+        min=float(values.min()),
+        max=float(values.max()),
+        first=first,
+        last=last,
+        transitions=transitions,
+    )
+
+
+def merge_stats(*stats):
+    """Returns the statistics of consecutive sequences from theirs.
+
+    Means and sums of squared deviations are combined with the parallel
+    algorithm of Chan et al., so any partition of a sequence (chunks, threads
+    or files) merges to the same statistics, up to rounding.  One transition
+    is counted between sequences whose last and first values differ.
+
+    Parameters
+    ----------
+    *stats : FieldStats
+        Statistics of each sequence, in order.
+
+    Returns
+    -------
+    stats : FieldStats
+    """
+    return reduce(_merge_pair, stats, EMPTY_STATS)
+
+
+def get_std(stats, ddof=1):
+    """Returns the standard deviation from `stats`.
+
+    Parameters
+    ----------
+    stats : FieldStats
+    ddof : int
+        Delta degrees of freedom; 1 (as `pd.DataFrame.describe`) for the sample
+        standard deviation.
+
+    Returns
+    -------
+    std : float
+        NaN with too few values.
+    """
+    if stats.count <= ddof:
+        return np.nan
+
+    return float(np.sqrt(stats.m2 / (stats.count - ddof)))
+
+
+def stats_to_frame(stats):
+    """Returns the statistics of many fields as a table.
+
+    Parameters
+    ----------
+    stats : dict
+        Label to FieldStats.
+
+    Returns
+    -------
+    stats_df : pd.DataFrame
+        Indexed by label, with count, mean, std, min, max and transitions
+        columns.
+    """
+    return pd.DataFrame(
+        [[s.count, s.mean if s.count else np.nan, get_std(s), s.min, s.max,
+            s.transitions] for s in stats.values()],
+        index=list(stats),
+        columns=["count", "mean", "std", "min", "max", "transitions"],
+    )
+
+
+def _merge_pair(a, b):
+    """Returns the statistics of sequence `a` followed by sequence `b`."""
+    if a.first is None:
+        return b
+    if b.first is None:
+        return a
+
+    transitions = a.transitions + b.transitions + int(a.last != b.first)
+    count = a.count + b.count
+
+    if not a.count or not b.count:
+        counted = a if a.count else b
+        return counted._replace(first=a.first, last=b.last, transitions=transitions)
+
+    delta = b.mean - a.mean
+
+    return FieldStats(
+        count=count,
+        mean=a.mean + delta * b.count / count,
+        m2=a.m2 + b.m2 + delta ** 2 * a.count * b.count / count,
+        min=min(a.min, b.min),
+        max=max(a.max, b.max),
+        first=a.first,
+        last=b.last,
+        transitions=transitions,
+    )
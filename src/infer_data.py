@@ -0,0 +1,496 @@
+"""
+Module to infer the packet map from the statistics of decoded bytes
+"""
+import warnings
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+# Relative imports
+from .lib import DATA_TYPES, DecoderRingError, cast_offsets, get_nbytes
+
+# Fields with at most this many distinct values are considered enums.
+MAX_ENUM_VALUES = 16
+
+# Minimum score of a field to be suggested as a known.
+MIN_SCORE = 0.5
+
+# Largest magnitude of a plausible float value.
+MAX_FLOAT = 1e15
+
+# Maximum number of packets sampled to estimate the entropy of fields.
+ENTROPY_SAMPLE = 16384
+
+# Minimum fraction of steps equal to the median step for a time field.
+MIN_TIME_REGULARITY = 0.99
+
+# Relative tolerance when comparing steps of float time fields.
+TIME_RTOL = 1e-6
+
+# Number of packets candidates are screened on before testing the full sample.
+SCREEN_PACKETS = 64
+
+# A field found by `detect_dpt_field` or `detect_time_field`, with its values
+# in the first and last packets and its (median) step between packets.
+DetectedField = namedtuple("DetectedField",
+        ["byte_idx", "dtype", "first", "last", "stride"])
+
+SCORE_COLUMNS = ["byte_idx", "dtype", "kind", "score", "smoothness",
+        "regularity", "monotonic", "carry_order", "bad_rate", "denormal_rate",
+        "min", "max", "nunique", "entropy"]
+
+
+def score_fields(packets, dtypes=None, knowns=None):
+    """Returns statistics and a score for every candidate field of `packets`.
+
+    Every (byte_idx, dtype) not overlapping `knowns` is a candidate.  For each
+    data-type, all offsets of all packets are cast at once (see
+    `lib.cast_offsets`), and statistics are computed column-wise:
+        smoothness : 1 - von Neumann ratio / 2, i.e. 1 for slowly varying
+            values, 0 for values independent from packet to packet.
+        regularity : fraction of steps between packets equal to the median
+            step (e.g. 1 for counters and fixed-rate clocks).
+        monotonic : fraction of steps in the dominant direction.
+        carry_order : 1 if each byte changes at least as often as the next
+            more significant byte, as carries in a single field do; lower
+            for fields straddling unrelated fields or in the wrong byte order.
+        bad_rate : fraction of NaN, infinite or implausibly large floats.
+        denormal_rate : fraction of denormal floats.
+        entropy : Shannon entropy of the values, normalized by its maximum.
+            Estimated from (at most) `ENTROPY_SAMPLE` evenly spaced packets,
+            as is `nunique`.
+    The score is the larger of smoothness and regularity, discounted by the
+    carry order and the bad and denormal rates, and weighted towards fields
+    with more entropy (so a whole field outranks its rarely changing high
+    bytes); constant fields score 0.
+
+    Parameters
+    ----------
+    packets : np.array(uint8)
+        Array of shape (npackets, packet_length), ordered in time.
+    dtypes : list of str, optional
+        Data-types to consider.  Defaults to all of `lib.DATA_TYPES`.
+    knowns : dict, optional
+        Portions of the byte map that are known.  Key is starting byte idx.
+        Value is a dict containing, at least:
+            "dtype" : str
+                Datatype bytes should be parsed as
+
+    Returns
+    -------
+    scores_df : pd.DataFrame
+        One row per candidate, sorted from highest to lowest score.
+
+    Raises
+    ------
+    DecoderRingError : for fewer than 3 packets.
+    """
+    if dtypes is None:
+        dtypes = list(DATA_TYPES)
+
+    if knowns is None:
+        knowns = {}
+
+    npackets, packet_length = packets.shape
+    if npackets < 3:
+        raise DecoderRingError("At least 3 packets are needed to score fields.")
+
+    known = _get_known_mask(knowns, packet_length)
+
+    # How often each byte changes from one packet to the next.
+    change_rate = np.mean(packets[1:] != packets[:-1], axis=0)
+
+    frames = []
+    for dtype in dtypes:
+        values, valid = cast_offsets(packets, dtype)
+
+        # Candidates must fit in the packet and not overlap a known.
+        nbytes = get_nbytes(dtype)
+        candidates = np.flatnonzero(valid & ~_get_overlaps(known, nbytes))
+
+        if not len(candidates):
+            continue
+
+        stats = _get_column_stats(values[:, candidates], dtype)
+        stats["byte_idx"] = candidates
+        stats["dtype"] = dtype
+        stats["carry_order"] = _get_carry_order(change_rate, candidates, dtype,
+                npackets)
+        stats["score"] = stats["score"] * stats["carry_order"]
+        frames.append(pd.DataFrame(stats))
+
+    if not frames:
+        return pd.DataFrame(columns=SCORE_COLUMNS)
+
+    scores_df = pd.concat(frames, ignore_index=True)
+    scores_df["nbytes"] = [get_nbytes(dtype) for dtype in scores_df["dtype"]]
+    scores_df["unused_sign"] = np.array([DATA_TYPES[dtype].kind == "i" for
+            dtype in scores_df["dtype"]]) & (scores_df["min"] >= 0)
+
+    # Rank by score.  On ties, prefer wider fields (they explain more bytes)
+    # and unsigned types for fields that are never negative.
+    return scores_df.sort_values(["score", "nbytes", "unused_sign", "byte_idx"],
+            ascending=[False, False, True, True], kind="stable")[SCORE_COLUMNS]\
+        .reset_index(drop=True)
+
+
+def suggest_knowns(scores_df, min_score=MIN_SCORE):
+    """Returns the best non-overlapping fields of `scores_df` as knowns.
+
+    Fields are taken greedily from highest to lowest score, skipping any that
+    overlap a field already taken.
+
+    Parameters
+    ----------
+    scores_df : pd.DataFrame
+        Output of `score_fields`.
+    min_score : float
+        Fields scoring below this are not suggested.
+
+    Returns
+    -------
+    knowns : dict
+        Byte idx to {"dtype": dtype, "label": "<kind>_<byte_idx>"}, ordered
+        from highest to lowest score.  Can be passed to `DataDecoder`.
+    """
+    knowns = {}
+    taken = set()
+
+    for row in scores_df[scores_df["score"] >= min_score].itertuples():
+        field_bytes = set(range(row.byte_idx, row.byte_idx + get_nbytes(row.dtype)))
+        if field_bytes & taken:
+            continue
+
+        knowns[int(row.byte_idx)] = {
+            "dtype": row.dtype,
+            "label": "{}_{}".format(row.kind, row.byte_idx),
+        }
+        taken |= field_bytes
+
+    return knowns
+
+
+def infer_knowns(packets, dtypes=None, knowns=None, min_score=MIN_SCORE):
+    """Returns suggested knowns for the bytes of `packets` not in `knowns`.
+
+    See `score_fields` and `suggest_knowns`.
+    """
+    return suggest_knowns(score_fields(packets, dtypes=dtypes, knowns=knowns),
+            min_score=min_score)
+
+
+def detect_dpt_field(packets, knowns=None, max_value=None):
+    """Returns the unsigned integer field incrementing by 1 every packet.
+
+    Every offset of every unsigned data-type is tested at once.  A wider type
+    also passes when the bytes it adds are constant, so the widest passing type
+    at the lowest byte idx is chosen, provided its last value does not exceed
+    `max_value` (i.e. the added bytes are 0).
+
+    Parameters
+    ----------
+    packets : np.array(uint8)
+        Array of shape (npackets, packet_length), ordered in time.
+    knowns : dict, optional
+        Portions of the byte map that are known; overlapping fields are skipped.
+    max_value : int, optional
+        Largest plausible datapoint count (e.g. the size of the file).
+
+    Returns
+    -------
+    field : DetectedField or None
+        None if no field increments by 1 in every one of (at least 2) packets.
+    """
+    def is_counter(values, dtype):
+        # Unsigned steps backwards wrap around, so never equal 1.
+        passed = (np.diff(values, axis=0) == 1).all(axis=0)
+
+        if max_value is not None:
+            passed &= values[-1] <= max_value
+
+        return passed
+
+    dtypes = [dtype for dtype, np_dtype in DATA_TYPES.items() if np_dtype.kind == "u"]
+
+    return _detect_field(packets, dtypes, is_counter, knowns=knowns)
+
+
+def detect_time_field(packets, knowns=None):
+    """Returns the strictly increasing field with a constant step.
+
+    Integer types are preferred over floats, then the lowest byte idx, then
+    wider types.  Floats with any denormal values are skipped, as the bits of
+    small increasing integers read as denormals of constant step.  Fields
+    overlapping `knowns` are skipped, so pass the dpt field (see
+    `detect_dpt_field`) to avoid finding it again.
+
+    Parameters
+    ----------
+    packets : np.array(uint8)
+        Array of shape (npackets, packet_length), ordered in time.
+    knowns : dict, optional
+        Portions of the byte map that are known; overlapping fields are skipped.
+
+    Returns
+    -------
+    field : DetectedField or None
+        None if no field increases in every one of (at least 2) packets with
+        `MIN_TIME_REGULARITY` of its steps equal.
+    """
+    def is_time(values, dtype):
+        is_float = DATA_TYPES[dtype].kind == "f"
+
+        with np.errstate(all="ignore"):
+            if is_float:
+                as_float = values.astype(np.float64)
+                steps = np.diff(as_float, axis=0)
+                median_step = np.median(steps, axis=0)
+                regular = np.isclose(steps, median_step, rtol=TIME_RTOL, atol=0)
+                finite = np.isfinite(as_float).all(axis=0)
+                denormal = ((as_float != 0) & (np.abs(as_float) <
+                        np.finfo(DATA_TYPES[dtype]).tiny)).any(axis=0)
+                valid = finite & ~denormal
+            else:
+                # Decreasing steps wrap around, but fail `increasing` anyway.
+                steps = np.diff(values, axis=0)
+                median_step = np.median(steps, axis=0)
+                regular = steps == median_step
+                valid = True
+
+            increasing = (values[1:] > values[:-1]).all(axis=0)
+
+        return valid & increasing & (regular.mean(axis=0) >= MIN_TIME_REGULARITY)
+
+    integer_dtypes = [dtype for dtype, np_dtype in DATA_TYPES.items() if
+            np_dtype.kind in "iu"]
+    float_dtypes = [dtype for dtype, np_dtype in DATA_TYPES.items() if
+            np_dtype.kind == "f"]
+
+    return _detect_field(packets, integer_dtypes, is_time, knowns=knowns) or \
+        _detect_field(packets, float_dtypes, is_time, knowns=knowns)
+
+
+def _detect_field(packets, dtypes, test, knowns=None):
+    """Returns the first field for which `test` passes.
+
+    Fields are ordered by byte idx, then from widest to narrowest type (a
+    narrower type at the same byte idx also passes when the value does not
+    carry into the bytes it drops), then unsigned before signed types.  Fields
+    whose least significant byte never changes are skipped: they are a field
+    shifted onto a constant neighbouring byte.
+
+    Parameters
+    ----------
+    packets : np.array(uint8)
+        Array of shape (npackets, packet_length), ordered in time.
+    dtypes : list of str
+        Data-types to test.
+    test : callable
+        Called as `test(values, dtype)` with the (npackets, ncandidates) values
+        of `dtype` at every candidate offset; returns a boolean per candidate.
+    knowns : dict, optional
+        Portions of the byte map that are known; overlapping fields are skipped.
+
+    Returns
+    -------
+    field : DetectedField or None
+    """
+    npackets, packet_length = packets.shape
+    if npackets < 2:
+        return None
+
+    known = _get_known_mask(knowns, packet_length)
+    changes = (packets[1:] != packets[:-1]).any(axis=0)
+
+    fields = []
+    for dtype in dtypes:
+        nbytes = get_nbytes(dtype)
+
+        # Screen candidates on the first few packets before casting them all.
+        values, valid = cast_offsets(packets[:SCREEN_PACKETS], dtype)
+        lsb = np.arange(packet_length) + (nbytes - 1 if dtype.endswith("be") else 0)
+        lsb_changes = changes[np.minimum(lsb, packet_length - 1)]
+        candidates = np.flatnonzero(valid & lsb_changes & ~_get_overlaps(known, nbytes))
+        candidates = candidates[test(values[:, candidates], dtype)]
+        if not len(candidates):
+            continue
+
+        values = np.stack([np.ascontiguousarray(packets[:, i:i + nbytes])
+            .view(DATA_TYPES[dtype])[:, 0] for i in candidates], axis=1)
+
+        for i in np.flatnonzero(test(values, dtype)):
+            fields.append(((candidates[i], -nbytes, DATA_TYPES[dtype].kind != "u"),
+                dtype, candidates[i], values[:, i]))
+
+    if not fields:
+        return None
+
+    _, dtype, byte_idx, column = min(fields, key=lambda field: field[0])
+
+    return DetectedField(
+        byte_idx=int(byte_idx),
+        dtype=dtype,
+        first=column[0].item(),
+        last=column[-1].item(),
+        stride=np.median(np.diff(column.astype(np.float64))).item(),
+    )
+
+
+def _get_known_mask(knowns, packet_length):
+    """Returns a boolean array marking the bytes covered by `knowns`."""
+    known = np.zeros(packet_length, dtype=bool)
+    for byte_idx, byte_dict in (knowns or {}).items():
+        known[byte_idx:byte_idx + get_nbytes(byte_dict["dtype"])] = True
+
+    return known
+
+
+def _get_overlaps(known, nbytes):
+    """Returns whether a field of `nbytes` at each byte idx overlaps `known`."""
+    return np.array([known[i:i + nbytes].any() for i in range(len(known))])
+
+
+def _get_column_stats(values, dtype):
+    """Returns statistics for each column of `values` (one field per column).
+
+    Parameters
+    ----------
+    values : np.array
+        Array of shape (npackets, ncandidates) of type `dtype`.
+    dtype : str
+        Key of data type in `DATA_TYPES`.
+
+    Returns
+    -------
+    stats : dict
+        Statistic name to np.array of shape (ncandidates,).
+    """
+    npackets = values.shape[0]
+    is_float = DATA_TYPES[dtype].kind == "f"
+
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        # All-NaN (i.e. all bad) candidates are expected.
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        as_float = values.astype(np.float64)
+
+        if is_float:
+            bad = ~np.isfinite(as_float) | (np.abs(as_float) > MAX_FLOAT)
+            tiny = np.finfo(DATA_TYPES[dtype]).tiny
+            denormal = (as_float != 0) & (np.abs(values) < tiny)
+            as_float = np.where(bad, np.nan, as_float)
+        else:
+            bad = np.zeros(values.shape, dtype=bool)
+            denormal = np.zeros(values.shape, dtype=bool)
+
+        # Only floats can hold NaNs; the NaN-aware reductions are slower.
+        if is_float:
+            median, mean, var, vmin, vmax = (np.nanmedian, np.nanmean,
+                    np.nanvar, np.nanmin, np.nanmax)
+        else:
+            median, mean, var, vmin, vmax = (np.median, np.mean, np.var,
+                    np.min, np.max)
+
+        steps = np.diff(as_float, axis=0)
+        median_step = median(steps, axis=0)
+
+        von_neumann = mean(steps ** 2, axis=0) / var(as_float, axis=0)
+        smoothness = 1 - np.clip(np.nan_to_num(von_neumann, nan=2.0) / 2, 0, 1)
+
+        regularity = np.mean(steps == median_step, axis=0)
+        monotonic = np.maximum(np.mean(steps >= 0, axis=0), np.mean(steps <= 0, axis=0))
+        strictly_increasing = np.mean(steps > 0, axis=0)
+
+        vmin = vmin(as_float, axis=0)
+        vmax = vmax(as_float, axis=0)
+
+    step = max(npackets // ENTROPY_SAMPLE, 1)
+    nunique, entropy = _get_column_entropy(values[::step][:ENTROPY_SAMPLE])
+
+    bad_rate = bad.mean(axis=0)
+    denormal_rate = denormal.mean(axis=0)
+    constant = ~(vmax > vmin)
+
+    score = np.maximum(smoothness, regularity) * (1 - bad_rate) * \
+        (1 - denormal_rate) * entropy ** 0.25
+    score[constant] = 0
+
+    kind = np.full(values.shape[1], "signal", dtype=object)
+    kind[nunique <= MAX_ENUM_VALUES] = "enum"
+    kind[monotonic >= 0.99] = "monotonic"
+    kind[(strictly_increasing >= 0.99) & (regularity >= 0.9)] = "time"
+    kind[(regularity >= 0.99) & (median_step == 1) & (not is_float)] = "counter"
+    kind[constant] = "constant"
+
+    return {
+        "kind": kind,
+        "score": score,
+        "smoothness": smoothness,
+        "regularity": regularity,
+        "monotonic": monotonic,
+        "bad_rate": bad_rate,
+        "denormal_rate": denormal_rate,
+        "min": vmin,
+        "max": vmax,
+        "nunique": nunique,
+        "entropy": entropy,
+    }
+
+
+def _get_carry_order(change_rate, byte_idxs, dtype, npackets):
+    """Returns how consistently less significant bytes change more often.
+
+    Parameters
+    ----------
+    change_rate : np.array(float)
+        Fraction of packets in which each byte changes.
+    byte_idxs : np.array(int)
+        First byte of each candidate field.
+    dtype : str
+        Key of data type in `DATA_TYPES`.
+    npackets : int
+
+    Returns
+    -------
+    carry_order : np.array(float)
+        Smallest ratio of the change rate of a byte to that of the next more
+        significant byte (capped at 1), per candidate.
+    """
+    nbytes = get_nbytes(dtype)
+    eps = 1.0 / npackets
+
+    # Bytes of each candidate, from least to most significant.
+    field_bytes = byte_idxs[:, None] + np.arange(nbytes)[None, :]
+    if dtype.endswith("be"):
+        field_bytes = field_bytes[:, ::-1]
+
+    if nbytes == 1:
+        return np.ones(len(byte_idxs))
+
+    rates = change_rate[field_bytes] + eps
+
+    return np.clip(rates[:, :-1] / rates[:, 1:], 0, 1).min(axis=1)
+
+
+def _get_column_entropy(values):
+    """Returns the number of distinct values and normalized entropy per column."""
+    npackets, ncolumns = values.shape
+
+    # Compare raw bits, so NaNs of the same pattern count as one value.
+    if values.dtype.itemsize <= 8:
+        values = values.view("u{}".format(values.dtype.itemsize))
+
+    # Sort each column; runs of equal values are the distinct values.
+    sorted_values = np.sort(np.ascontiguousarray(values.T), axis=1).ravel()
+    starts = np.ones(sorted_values.shape, dtype=bool)
+    starts[1:] = sorted_values[1:] != sorted_values[:-1]
+    starts[::npackets] = True
+
+    start_idx = np.flatnonzero(starts)
+    run_lengths = np.diff(np.append(start_idx, sorted_values.size))
+    run_columns = start_idx // npackets
+
+    p = run_lengths / npackets
+    entropy = np.bincount(run_columns, weights=-p * np.log2(p), minlength=ncolumns)
+
+    return np.bincount(run_columns, minlength=ncolumns), entropy / np.log2(npackets)
@@ -111,3 +111,122 @@ def cast_to_bytes(val, dtype):
         return np.array(val, dtype=DATA_TYPES[dtype]).tobytes()
     except KeyError:
         raise DecoderRingError("Invalid data-type {}.".format(dtype))
+
+
+def get_packet_dtype(knowns, packet_length):
+    """Returns a structured data-type laying out `knowns` in a packet.
+
+    Each known becomes a field, named by its label, at its byte offset.  The
+    itemsize of the data-type is `packet_length`, so an array of this type
+    can be read directly from a stream of packets.
+
+    Parameters
+    ----------
+    knowns : dict
+        Portions of the byte map that are known.  Key is starting byte idx.
+        Value is a dict containing, at least:
+            "dtype" : str
+                Datatype bytes should be parsed as
+            "label" : str
+                Column label for the data.
+    packet_length : int
+        Number of bytes in each packet.
+
+    Returns
+    -------
+    packet_dtype : np.dtype
+
+    Raises
+    ------
+    DecoderRingError : for invalid data-types, duplicate labels or knowns
+    that do not fit in the packet.
+    """
+    if knowns is None:
+        knowns = {}
+
+    return get_fields_dtype(
+        [(byte_dict["label"], byte_idx, byte_dict["dtype"]) for byte_idx, byte_dict
+            in knowns.items()],
+        packet_length
+    )
+
+
+def get_fields_dtype(fields, packet_length):
+    """Returns a structured data-type laying out `fields` in a packet.
+
+    Unlike `get_packet_dtype`, fields may overlap (e.g. the same bytes read as
+    different data-types).
+
+    Parameters
+    ----------
+    fields : list of (str, int, str)
+        Name, starting byte idx and data-type of each field.
+    packet_length : int
+        Number of bytes in each packet.
+
+    Returns
+    -------
+    packet_dtype : np.dtype
+
+    Raises
+    ------
+    DecoderRingError : for invalid data-types, duplicate names or fields that
+    do not fit in the packet.
+    """
+    names, formats, offsets = [], [], []
+
+    for name, byte_idx, dtype in fields:
+        if byte_idx < 0 or byte_idx + get_nbytes(dtype) > packet_length:
+            raise DecoderRingError(
+                "Field {} at byte {} does not fit in a packet of {} bytes.".format(
+                    name, byte_idx, packet_length)
+            )
+
+        names.append(name)
+        formats.append(DATA_TYPES[dtype])
+        offsets.append(byte_idx)
+
+    try:
+        return np.dtype({
+            "names": names,
+            "formats": formats,
+            "offsets": offsets,
+            "itemsize": packet_length,
+        })
+    except ValueError as e:
+        raise DecoderRingError("Invalid fields: {}".format(e))
+
+
+def cast_offsets(packets, dtype):
+    """Reads `packets` as type `dtype` starting at every byte offset at once.
+
+    Uses a strided (sliding-window) view of the packet bytes, so every offset
+    of every packet is reinterpreted in a single vectorized cast.
+
+    Parameters
+    ----------
+    packets : np.array(uint8)
+        Array of shape (npackets, packet_length).
+    dtype : str
+        Key of data type in `DATA_TYPES`.
+
+    Returns
+    -------
+    values : np.array
+        Array of shape (npackets, packet_length); `values[n, i]` is the value
+        of `dtype` starting at byte `i` of packet `n`.  Offsets with too few
+        bytes remaining in the packet are read as if zero-padded.
+    valid : np.array(bool)
+        Array of shape (packet_length,); False for offsets with too few bytes
+        remaining in the packet to read `dtype`.
+    """
+    nbytes = get_nbytes(dtype)
+    npackets, packet_length = packets.shape
+
+    padded = np.zeros((npackets, packet_length + nbytes - 1), dtype=np.uint8)
+    padded[:, :packet_length] = packets
+
+    windows = np.lib.stride_tricks.sliding_window_view(padded, nbytes, axis=1)
+    values = np.ascontiguousarray(windows).view(DATA_TYPES[dtype])[..., 0]
+
+    return values, np.arange(packet_length) + nbytes <= packet_length
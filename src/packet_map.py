@@ -1,6 +1,11 @@
 """
 Defines the byte-packet shape and data header.
 """
+import datetime
+from collections import namedtuple
+
+# Relative imports
+from .lib import DecoderRingError
 
 # Byte-packet definition for each datapoint
 PACKET_MAP = {
@@ -45,6 +50,12 @@ HEADER_CHAR_LIMIT = 25
 
 VERSION = "Acme v1.0"
 
+# Format of the start time in the header.
+HEADER_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Metadata encoded in the header; see `parse_header_bytes`.
+Header = namedtuple("Header", ["version", "filename", "start_time"])
+
 
 def _generate_header_str(version_string, filename, start_time,
         char_limit=HEADER_CHAR_LIMIT):
@@ -68,7 +79,7 @@ def _generate_header_str(version_string, filename, start_time,
     return "{}\n{}\n{}\n".format(
         version_string.ljust(char_limit),
         filename.ljust(char_limit),
-        start_time.strftime("%Y-%m-%d %H:%M:%S").ljust(char_limit)
+        start_time.strftime(HEADER_TIME_FORMAT).ljust(char_limit)
     )
 
 
@@ -96,3 +107,49 @@ def get_header_bytes(filename, start_time,
     """
     return bytes(_generate_header_str(version_string, filename, start_time,
             char_limit=char_limit), encoding="utf-8") + start_bytes
+
+
+def parse_header_bytes(header_bytes, start_bytes=START_BYTES):
+    """Returns the metadata encoded in `header_bytes`.
+
+    The inverse of `get_header_bytes`.
+
+    Parameters
+    ----------
+    header_bytes : byte str
+        Bytes from the start of the file to the start of the data.  A trailing
+        `start_bytes` is ignored.
+    start_bytes : bytearray
+        List of bytes indicating the end of the header, start of the data.
+
+    Returns
+    -------
+    header : Header
+        Version string, filename and start time (datetime.datetime).
+
+    Raises
+    ------
+    DecoderRingError : if `header_bytes` is not a header of this format.
+    """
+    header_bytes = bytes(header_bytes)
+    if header_bytes.endswith(bytes(start_bytes)):
+        header_bytes = header_bytes[:-len(start_bytes)]
+
+    try:
+        fields = header_bytes.decode("utf-8").split("\n")
+    except UnicodeDecodeError:
+        raise DecoderRingError("Header is not utf-8 encoded.")
+
+    if (len(fields) != 4) or fields[-1]:
+        raise DecoderRingError(
+            "Invalid header; expected 3 lines, got {}.".format(header_bytes)
+        )
+
+    version_string, filename, start_time = [field.strip() for field in fields[:3]]
+
+    try:
+        start_time = datetime.datetime.strptime(start_time, HEADER_TIME_FORMAT)
+    except ValueError:
+        raise DecoderRingError("Invalid start time {} in header.".format(start_time))
+
+    return Header(version_string, filename, start_time)
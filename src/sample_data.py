@@ -6,7 +6,8 @@ import pandas as pd
 import numpy as np
 
 # Relative imports
-from .lib import DecoderRingError
+from .lib import DATA_TYPES, DecoderRingError
+from .packet_map import PACKET_MAP
 
 # Potential during CC charging and discharging
 I_MAX = 1.0
@@ -31,6 +32,28 @@ STEP_ORDER = [
 # Step-type code to step-type enum (for encoding).
 STEP_CODE_HASH = {'C': 1, 'RAC': 2, 'D': 3, 'RAD': 4}
 
+# Step codes of each cycle of synthetic data.
+CYCLE_STEPS = ('C', 'RAC', 'D', 'RAD')
+
+# Seconds between datapoints.
+DT = 0.5
+
+# Standard deviations of the noise on synthetic current and potential.
+CUR_NOISE = 1e-3
+POT_NOISE = 1e-3
+
+# Maximum deviation of synthetic timestamps from the regular interval, in
+# seconds at DT (and in proportion to other intervals); less than DT / 2, so
+# time still increases.
+TIME_JITTER = 1e-3
+
+# Number of rows of synthetic data generated at a time.
+SYNTHETIC_CHUNK_ROWS = 1000000
+
+# Number of rows of noise drawn from each seeded generator, so the noise of a
+# row does not depend on the chunk it is generated in.
+NOISE_BLOCK_ROWS = 2 ** 16
+
 
 def _get_step_dpt_data(last_val, n=N_PER_STEP):
     """Returns the dpt-data for a single step.
@@ -288,6 +311,163 @@ def create_data(step_order=STEP_ORDER, n=N_PER_STEP, v_min=V_MIN, v_max=V_MAX,
     return df
 
 
+def iter_data(ncycles, step_points=N_PER_STEP, seed=0, chunk_rows=SYNTHETIC_CHUNK_ROWS,
+        cur_noise=CUR_NOISE, pot_noise=POT_NOISE, time_jitter=None, dt=DT,
+        v_min=V_MIN, v_max=V_MAX, i_max=I_MAX, packet_map=PACKET_MAP):
+    """Returns an iterator of synthetic data of `ncycles` cycles, one chunk at a time.
+
+    Each cycle steps through `CYCLE_STEPS`, as `create_data` (which it matches,
+    data-types included, without noise or jitter).  Every column of a chunk is
+    computed at once from the row positions, so any number of rows (e.g.
+    10^8) is generated in constant memory.  The data are determined by `seed`
+    alone, whatever the `chunk_rows`.  Current, potential and time are
+    rounded to the precision they are encoded with in `packet_map`.
+
+    Arguments are checked when called, before any data are generated.
+
+    Parameters
+    ----------
+    ncycles : int
+        Number of cycles.
+    step_points : int or dict
+        Number of datapoints of every step, or step code to the number of
+        datapoints of that step.
+    seed : int
+        Seed of the noise and jitter.
+    chunk_rows : int
+        Maximum number of rows yielded at a time.
+    cur_noise, pot_noise : float
+        Standard deviation of the gaussian noise on current and potential.
+    time_jitter : float, optional
+        Maximum deviation of each timestamp from the regular interval.
+        Defaults to `TIME_JITTER`, scaled by `dt` / `DT`.
+    dt : float
+        Seconds between datapoints.
+    v_min, v_max, i_max : float
+        See `create_data`.
+    packet_map : dict
+        Packet map the data are to be encoded with.  See
+        `packet_map.PACKET_MAP`.
+
+    Returns
+    -------
+    chunks : iterator of pd.DataFrame
+        Same columns as `create_data`, indexed by row position.
+
+    Raises
+    ------
+    DecoderRingError : for invalid arguments, or if the dpt, cycle or time
+    of the last row do not fit their data-types in `packet_map` (e.g. the
+    "time" of `PACKET_MAP` holds ~429,000 seconds).
+    """
+    if not isinstance(step_points, dict):
+        step_points = {step_code: step_points for step_code in CYCLE_STEPS}
+
+    if time_jitter is None:
+        time_jitter = TIME_JITTER * dt / DT
+
+    points = np.array([step_points[step_code] for step_code in CYCLE_STEPS])
+    if (points < 1).any() or (chunk_rows < 1) or (ncycles < 0):
+        raise DecoderRingError("Invalid ncycles, step_points or chunk_rows.")
+
+    if not 0 <= time_jitter < dt / 2.0:
+        raise DecoderRingError("Invalid time_jitter {}; must be less than half of "
+                "dt.".format(time_jitter))
+
+    nrows = ncycles * int(points.sum())
+    _check_range({"dpt": nrows, "cyc": ncycles, "time": nrows * dt + time_jitter},
+            packet_map)
+
+    return _iter_chunks(ncycles, points, seed, chunk_rows, cur_noise, pot_noise,
+            time_jitter, dt, v_min, v_max, i_max, packet_map)
+
+
+def _iter_chunks(ncycles, points, seed, chunk_rows, cur_noise, pot_noise,
+        time_jitter, dt, v_min, v_max, i_max, packet_map):
+    """Yields the chunks of synthetic data; see `iter_data`."""
+    # Per-step values, indexed by the position of the step in the cycle.
+    step_ends = np.cumsum(points)
+    step_starts = step_ends - points
+    codes = np.array([STEP_CODE_HASH[step_code] for step_code in CYCLE_STEPS],
+            dtype=float)
+    currents = np.array([i_max, 0.0, -i_max, 0.0])
+    pot_starts = np.array([v_min, v_max, v_max, v_min])
+    pot_ends = np.array([v_max, v_max, v_min, v_min])
+
+    nrows = ncycles * step_ends[-1]
+
+    for start in range(0, nrows, chunk_rows):
+        rows = np.arange(start, min(start + chunk_rows, nrows))
+        cyc, pos = np.divmod(rows, step_ends[-1])
+        step = np.searchsorted(step_ends, pos, side="right")
+
+        # Fraction of the way through each step, for the potential ramps.
+        frac = (pos - step_starts[step]) / np.maximum(points[step] - 1, 1)
+
+        noise = _get_noise(start, len(rows), seed)
+
+        yield pd.DataFrame({
+            "dpt": rows + 1,
+            "cyc": (cyc + 1).astype(float),
+            "stp": codes[step],
+            "cur": _quantize(currents[step] + cur_noise * noise[0], "cur", packet_map),
+            "pot": _quantize(pot_starts[step] + (pot_ends[step] - pot_starts[step]) *
+                frac + pot_noise * noise[1], "pot", packet_map),
+            "time": _quantize((rows + 1) * dt + time_jitter * noise[2], "time",
+                packet_map),
+            "start": 170,
+        }, index=pd.RangeIndex(start, start + len(rows)))
+
+
+def _check_range(maxima, packet_map):
+    """Raises DecoderRingError if the largest value of a label does not fit its
+    integer data-type in `packet_map`."""
+    for byte_dict in packet_map.values():
+        label = byte_dict["label"]
+        dtype = DATA_TYPES[byte_dict["dtype"]]
+
+        if (label not in maxima) or (dtype.kind not in "iu"):
+            continue
+
+        if np.round(maxima[label] * byte_dict.get("factor", 1)) > np.iinfo(dtype).max:
+            raise DecoderRingError("Synthetic {} up to {} does not fit {}; generate "
+                    "fewer rows or change the packet map.".format(label, maxima[label],
+                    byte_dict["dtype"]))
+
+
+def _get_noise(start, nrows, seed):
+    """Returns noise of rows [start, start + nrows), drawn block by block.
+
+    Returns
+    -------
+    noise : np.array(float)
+        Array of shape (3, nrows): standard normal noise for the current and
+        potential, and uniform noise in [-1, 1) for the time.
+    """
+    first, last = start // NOISE_BLOCK_ROWS, (start + nrows - 1) // NOISE_BLOCK_ROWS
+
+    blocks = []
+    for block in range(first, last + 1):
+        rng = np.random.default_rng([seed, block])
+        blocks.append(np.vstack([
+            rng.standard_normal((2, NOISE_BLOCK_ROWS)),
+            rng.uniform(-1.0, 1.0, (1, NOISE_BLOCK_ROWS)),
+        ]))
+
+    offset = start - first * NOISE_BLOCK_ROWS
+
+    return np.hstack(blocks)[:, offset:offset + nrows]
+
+
+def _quantize(values, label, packet_map=PACKET_MAP):
+    """Rounds `values` to the precision `label` is encoded with."""
+    for byte_dict in packet_map.values():
+        if (byte_dict["label"] == label) and ("factor" in byte_dict):
+            return np.round(values * byte_dict["factor"]) / byte_dict["factor"]
+
+    return values
+
+
 def main():
     """Writes the sample data-set to file as a csv
 
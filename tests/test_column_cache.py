@@ -0,0 +1,147 @@
+"""
+Tests of the column_cache module.
+"""
+import os
+import shutil
+import numpy as np
+import pytest
+
+from src import column_cache
+
+
+KNOWNS = {
+    0: {"label": "dpt", "dtype": "uint8le"},
+    3: {"label": "cur", "dtype": "uint32le", "factor": 2},
+}
+
+
+@pytest.fixture()
+def source_file(tmp_path):
+    """Returns the path to a small file to cache columns of."""
+    filepath = os.path.join(tmp_path.as_posix(), "source.unk")
+    with open(filepath, "wb") as f:
+        f.write(bytes(range(21)))
+
+    return filepath
+
+
+@pytest.fixture()
+def columns():
+    """Returns decoded columns to cache."""
+    return {"dpt": np.array([1.0, 2.0, 3.0]), "cur": np.array([1.5, 2.0, 2.5])}
+
+
+def test_get_cache_dir(source_file):
+    """Tests the get_cache_dir method."""
+    assert column_cache.get_cache_dir(source_file) == \
+        os.path.join(os.path.dirname(source_file), column_cache.CACHE_DIRNAME)
+    assert column_cache.get_cache_dir(source_file, cache_root="/tmp/cache") == "/tmp/cache"
+
+
+def test_get_schema_hash():
+    """Tests the get_schema_hash method changes with the knowns and packet length."""
+    actual = column_cache.get_schema_hash(KNOWNS, 7)
+
+    assert actual == column_cache.get_schema_hash(dict(reversed(list(KNOWNS.items()))), 7)
+    assert actual != column_cache.get_schema_hash(KNOWNS, 8)
+    assert actual != column_cache.get_schema_hash(
+        {0: KNOWNS[0], 3: dict(KNOWNS[3], factor=3)}, 7)
+
+
+def test_save_columns(source_file, columns):
+    """Tests the save_columns and load_columns methods."""
+    assert column_cache.load_columns(source_file, KNOWNS, 7) is None
+
+    saved = column_cache.save_columns(source_file, KNOWNS, 7, columns)
+    actual = column_cache.load_columns(source_file, KNOWNS, 7)
+
+    for cached in [saved, actual]:
+        assert list(cached) == ["dpt", "cur"]
+        assert isinstance(cached["cur"], np.memmap)
+        assert cached["cur"].tolist() == [1.5, 2.0, 2.5]
+
+    # Another schema is a separate entry.
+    assert column_cache.load_columns(source_file, KNOWNS, 8) is None
+
+    # Entries of another number of rows are misses.
+    assert column_cache.load_columns(source_file, KNOWNS, 7, nrows=3) is not None
+    assert column_cache.load_columns(source_file, KNOWNS, 7, nrows=4) is None
+
+
+def test_save_columns__signature(source_file, columns):
+    """Tests the save_columns method signs entries as of before decoding."""
+    signature = column_cache.get_file_signature(source_file)
+
+    # The source grows while the columns are decoded.
+    with open(source_file, "ab") as f:
+        f.write(bytes(range(7)))
+
+    assert column_cache.save_columns(source_file, KNOWNS, 7, columns,
+            signature=signature) is None
+    assert column_cache.load_columns(source_file, KNOWNS, 7) is None
+
+
+def test_load_columns__stale(source_file, columns):
+    """Tests the load_columns method invalidates entries of a changed file."""
+    column_cache.save_columns(source_file, KNOWNS, 7, columns)
+
+    # Same size, contents changed.
+    with open(source_file, "r+b") as f:
+        f.write(b"\x07")
+
+    assert column_cache.load_columns(source_file, KNOWNS, 7) is None
+    assert os.listdir(column_cache.get_cache_dir(source_file)) == []
+
+
+def test_evict(source_file, columns, tmp_path):
+    """Tests the least recently used entries are evicted to fit the cache."""
+    cache_root = os.path.join(tmp_path.as_posix(), "cache")
+    entries = [column_cache._get_entry_dir(source_file, KNOWNS, packet_length,
+            cache_root=cache_root) for packet_length in [7, 8]]
+
+    column_cache.save_columns(source_file, KNOWNS, 7, columns, cache_root=cache_root)
+    column_cache.save_columns(source_file, KNOWNS, 8, columns, cache_root=cache_root)
+    entry_bytes = sum(os.path.getsize(os.path.join(entries[0], filename)) for
+            filename in os.listdir(entries[0]))
+
+    # Use the first entry, so the second is the least recently used.
+    os.utime(os.path.join(entries[1], column_cache.META_FILENAME), (0, 0))
+    assert column_cache.load_columns(source_file, KNOWNS, 7,
+            cache_root=cache_root) is not None
+
+    assert column_cache.evict(cache_root, max_bytes=entry_bytes) == [entries[1]]
+    assert os.listdir(cache_root) == [os.path.basename(entries[0])]
+
+    # Entries still being written are never listed, so never evicted.
+    tmp = "{}.tmp-{}".format(entries[0], os.getpid())
+    shutil.copytree(entries[0], tmp)
+    assert column_cache.evict(cache_root, max_bytes=0, keep=entries[0]) == []
+    shutil.rmtree(tmp)
+
+    # The entry just saved is kept, even if it alone is too large.
+    column_cache.save_columns(source_file, KNOWNS, 8, columns, cache_root=cache_root,
+            max_bytes=0)
+    assert os.listdir(cache_root) == [os.path.basename(entries[1])]
+
+
+def test_append_columns(source_file, columns):
+    """Tests the append_columns method appends rows in place."""
+    column_cache.save_columns(source_file, KNOWNS, 7, columns)
+    entry = column_cache._get_entry_dir(source_file, KNOWNS, 7)
+
+    # The source grows, and so do its columns.
+    with open(source_file, "ab") as f:
+        f.write(bytes(range(7)))
+    grown = {label: np.append(values, [9.0, 10.0]) for label, values in columns.items()}
+
+    column_cache.append_columns(source_file, KNOWNS, 7, grown, 3)
+    actual = column_cache.load_columns(source_file, KNOWNS, 7)
+
+    assert actual["dpt"].tolist() == [1.0, 2.0, 3.0, 9.0, 10.0]
+    assert actual["cur"].tolist() == [1.5, 2.0, 2.5, 9.0, 10.0]
+    assert column_cache._read_meta(entry)["nrows"] == 5
+
+    # Rows out of step with the entry are saved in full instead.
+    column_cache.append_columns(source_file, KNOWNS, 7, columns, 4)
+    assert column_cache.load_columns(source_file, KNOWNS, 7)["dpt"].tolist() == \
+        [1.0, 2.0, 3.0]
@@ -4,12 +4,16 @@ Tests of the decode_data module.
 See the end-to-end test in test_encode_data.
 """
 import os
+import asyncio
+import threading
+import tracemalloc
 import pandas as pd
 import numpy as np
 import pytest
 from collections import namedtuple
+from dateutil.parser import parse
 
-from src import decode_data, packet_map
+from src import decode_data, packet_map, lib
 
 
 SampleFile = namedtuple("SampleFile", ["filesize", "ndpts",
@@ -20,11 +24,9 @@ SampleFile = namedtuple("SampleFile", ["filesize", "ndpts",
 @pytest.fixture()
 def sample_file():
     """Returns a fixture containing small number of sample bytes and params for decoding."""
-    header_str = "debug.unk \n"
-
     sample_bytes = (
-        # Header bytes - debug.unk \n\xaa\xaa\x01
-        bytes(header_str, encoding="utf-8") + packet_map.START_BYTES +
+        # Header bytes, ending with \xaa\xaa\x01
+        packet_map.get_header_bytes("debug.unk", parse("2020-03-17 10:00:00")) +
         # Datapoint 1: 1 (8bit), 2 (16bit), 3 (32bit)
         b'\x01\x02\x00\x03\x00\x00\x00'
         # Datapoint 2: 2 (8bit), 3 (16bit), 4 (32bit)
@@ -230,7 +232,7 @@ def sample_file():
     dtypes = ["uint8le", "uint16le", "uint16be", "uint32le"]
 
     return SampleFile(
-        filesize=35,
+        filesize=len(sample_bytes),
         ndpts=ndpts,
         starting_bytes=starting_bytes,
         seed_df=seed_df,
@@ -362,6 +364,41 @@ def test_decode_knowns(sample_file, temp_file, sample_decoder):
     assert (expected == actual).all().all()
 
 
+@pytest.mark.parametrize("threads", [1, 2])
+def test_decode_knowns__matches_per_packet(tmp_path, threads):
+    """Tests decode_knowns matches decoding packet by packet, data-types included."""
+    knowns = {
+        0: {"label": "dpt", "dtype": "uint8le"},
+        1: {"label": "temp", "dtype": "f32le"},
+        5: {"label": "cur", "dtype": "int16le", "factor": 100},
+    }
+    packets = b"".join(
+        lib.cast_to_bytes(dpt, "uint8le") +
+        lib.cast_to_bytes(dpt * 1.1, "f32le") +
+        lib.cast_to_bytes(-dpt * 7, "int16le")
+        for dpt in range(1, 11)
+    )
+
+    filepath = os.path.join(tmp_path.as_posix(), "float.unk")
+    with open(filepath, "wb") as f:
+        f.write(packet_map.get_header_bytes("float.unk", parse("2020-03-17 10:00:00")) +
+                packets)
+
+    decoder = decode_data.DataDecoder(filepath, packet_length=7, knowns=knowns,
+            dpt_index=0, threads=threads)
+
+    expected = pd.DataFrame([
+        {byte_dict["label"]: decode_data.decode_bytes(packets[n:n + 7], byte_idx,
+                byte_dict["dtype"]) / byte_dict.get("factor", 1) for byte_idx, byte_dict
+                in knowns.items()}
+        for n in range(0, len(packets), 7)
+    ])
+    actual = decoder.decode_knowns()
+
+    pd.testing.assert_frame_equal(actual, expected)
+    assert decoder.decode_byte_idx(label="temp") == expected["temp"].tolist()
+
+
 def test_seed_data(sample_file, temp_file):
     """Tests the seed_data method."""
 
@@ -533,3 +570,903 @@ def test_get_packet(sample_bytes):
 def test_decode_bytes(byte_idx, dtype, expected, sample_bytes):
     """Tests the decode_bytes method."""
     assert decode_data.decode_bytes(sample_bytes, byte_idx, dtype) == expected
+
+
+def test_read_packets(sample_file, temp_file):
+    """Tests the read_packets method."""
+    actual = decode_data.read_packets(
+        temp_file,
+        np.dtype(("u1", sample_file.packet_length)),
+        offset=sample_file.filesize - 2 * sample_file.packet_length,
+        count=2
+    )
+
+    assert actual.shape == (2, sample_file.packet_length)
+    assert actual.tobytes() == sample_file.sample_bytes[-14:]
+
+
+@pytest.mark.parametrize("backend", decode_data.BACKENDS)
+def test_read_packets__step(sample_file, temp_file, backend):
+    """Tests the read_packets method reads every `step`th packet."""
+    buffer = decode_data.map_file(temp_file) if backend == "mmap" else None
+    dtype = lib.get_packet_dtype({0: {"label": "dpt", "dtype": "uint8le"}},
+            sample_file.packet_length)
+    offset = sample_file.filesize - 3 * sample_file.packet_length
+
+    for count in [-1, 2, 5]:
+        actual = decode_data.read_packets(temp_file, dtype, offset=offset,
+                count=count, buffer=buffer, step=2)
+        assert actual["dpt"].tolist() == [1, 3]
+
+    with pytest.raises(lib.DecoderRingError):
+        decode_data.read_packets(temp_file, dtype, step=0)
+        assert False, "DecoderRingError should have been raised."
+
+
+def test_decode_records(sample_file):
+    """Tests the decode_records method."""
+    knowns = {
+        0: {"label": "dpt", "dtype": "uint8le"},
+        3: {"label": "cur", "dtype": "uint32le", "factor": 2},
+    }
+    records = np.frombuffer(
+        sample_file.sample_bytes[-21:],
+        dtype=lib.get_packet_dtype(knowns, sample_file.packet_length)
+    )
+
+    actual = decode_data.decode_records(records, knowns)
+
+    assert list(actual) == ["dpt", "cur"]
+    assert (actual["dpt"] == np.array([1, 2, 3])).all()
+    assert (actual["cur"] == np.array([1.5, 2.0, 2.5])).all()
+
+
+def test_data_decoder__mmap_backend(sample_file, temp_file, sample_decoder):
+    """Tests the mmap backend decodes the same data, without copying."""
+    knowns = {0: {"label": "dpt", "dtype": "uint8le"}}
+
+    with decode_data.DataDecoder(
+        filepath=temp_file,
+        ndpts=sample_file.ndpts,
+        dtypes=sample_file.dtypes,
+        starting_bytes=sample_file.starting_bytes,
+        packet_length=sample_file.packet_length,
+        knowns=sample_file.knowns,
+        dpt_index=0,
+        backend="mmap",
+    ) as decoder:
+        assert (decoder._seed_df == sample_decoder._seed_df).all().all()
+
+        records = decoder.read_records(3, knowns=knowns)
+        assert not records.flags.owndata
+        assert not records["dpt"].flags.writeable
+        assert (records["dpt"] == np.array([1, 2, 3])).all()
+
+        assert decoder.decode_byte_idx(byte_idx=1, dtype="uint16le", dpts=3) == \
+            sample_decoder.decode_byte_idx(byte_idx=1, dtype="uint16le", dpts=3)
+
+        decoder._knowns = knowns
+        assert (decoder.decode_knowns(dpts=3)["dpt"] == [1, 2, 3]).all()
+
+    assert decoder._buffer is None
+
+
+def test_data_decoder__bad_backend(temp_file):
+    """Tests the DataDecoder raises an error for an unsupported backend."""
+    with pytest.raises(decode_data.DecoderRingError):
+        _ = decode_data.DataDecoder(temp_file, backend="junk")
+        assert False, "DecoderRingError should have been raised."
+
+
+def test_iter_knowns(sample_decoder):
+    """Tests the iter_knowns method of the DataDecoder class."""
+    sample_decoder._knowns = {0: {"label": "dpt", "dtype": "uint8le"}}
+
+    chunks = list(sample_decoder.iter_knowns(chunk_packets=2, dpts=3))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert pd.concat(chunks).equals(sample_decoder.decode_knowns(dpts=3))
+
+
+def test_seed_tensor(sample_file, temp_file):
+    """Tests the seed_tensor method."""
+    actual = decode_data.seed_tensor(
+        temp_file,
+        ndpts=sample_file.ndpts,
+        dtypes=["uint16le"],
+        starting_bytes=[0, 1],
+        packet_length=sample_file.packet_length,
+        knowns={3: {"label": "cur", "dtype": "uint8le"}},
+    )
+
+    assert (actual.ns == np.array([3, 2, 1])).all()
+    assert actual.packets.shape == (3, sample_file.packet_length)
+    assert (actual.values["uint16le"][:, 1] == np.array([2, 3, 4])).all()
+    assert (actual.known == np.array([0, 0, 0, 1, 0, 0, 0], dtype=bool)).all()
+    assert (actual.first["uint16le"] == np.array([
+        [1, 0, 0, 0, 1, 0, 1],
+        [0, 1, 0, 0, 0, 1, 0],
+    ], dtype=bool)).all()
+    assert (actual.wasted["uint16le"] == np.array([
+        [0, 0, 1, 0, 0, 0, 0],
+        [0, 0, 0, 0, 1, 0, 0],
+    ], dtype=bool)).all()
+    assert (actual.filled["uint16le"] == np.array([
+        [1, 1, 0, 0, 1, 1, 1],
+        [0, 1, 1, 0, 0, 1, 1],
+    ], dtype=bool)).all()
+
+
+def test_get_layout_plan(sample_knowns, byte_idx_lists):
+    """Tests the get_layout_plan method, including that plans are reused."""
+    decode_data._get_layout_plan.cache_clear()
+
+    actual = decode_data.get_layout_plan(
+        "uint32le",
+        byte_idx_lists.starting_byte,
+        sample_knowns,
+        packet_length=byte_idx_lists.packet_length
+    )
+
+    assert list(actual.first_bytes) == byte_idx_lists.first_bytes
+    assert list(actual.wasted_bytes) == byte_idx_lists.wasted_bytes
+    assert list(actual.filled_bytes) == byte_idx_lists.filled_bytes
+    assert actual.rows[0] == (0, "known", ("uint8le", "start"))
+    assert actual.rows[5] == (5, "static", {"val": "*"})
+    assert actual.rows[8] == (8, "value", None)
+    assert actual.rows[9] == (9, "static", {"val": "-"})
+
+    # Equal knowns from a different dict share the cached plan.
+    assert decode_data.get_layout_plan(
+        "uint32le",
+        byte_idx_lists.starting_byte,
+        dict(sample_knowns),
+        packet_length=byte_idx_lists.packet_length
+    ) is actual
+
+
+def test_data_decoder__lazy_seeding(sample_file, sample_decoder):
+    """Tests the DataDecoder only seeds the combinations that are viewed."""
+    assert sample_decoder._full_seed_df is None
+    assert sample_decoder._seed_dfs == {}
+
+    dtypes = ["uint8le", "uint16le", "uint16be"]
+    actual = sample_decoder.view_dtypes(1, dtypes)
+    expected = decode_data.view_dtypes(sample_file.seed_df, 1, dtypes)
+
+    assert (actual == expected).all().all()
+    assert set(sample_decoder._seed_dfs) == {(1, dtype) for dtype in dtypes}
+
+    actual = sample_decoder.view_byte_idx(1, 1, dtypes=["uint8le", "uint16be"])
+    expected = decode_data.view_byte_idx(sample_file.seed_df, 1, 1,
+            dtypes=["uint8le", "uint16be"])
+
+    assert (actual == expected).all().all()
+    assert sample_decoder._full_seed_df is None
+
+
+def test_data_decoder__view_byte_idx_default_dtypes(sample_file, sample_decoder,
+        temp_file):
+    """Tests DataDecoder.view_byte_idx shows the dtypes of init, in order."""
+    actual = sample_decoder.view_byte_idx(1, 1)
+    assert list(actual.columns) == sample_file.dtypes
+
+    decoder = decode_data.DataDecoder(temp_file, ndpts=sample_file.ndpts,
+            packet_length=sample_file.packet_length, knowns=None, dpt_index=0)
+    assert list(decoder.view_byte_idx(1, 1).columns) == list(lib.DATA_TYPES)
+
+
+def test_data_decoder__max_dpts(sample_file, temp_file):
+    """Tests the DataDecoder reads the max dpts from the last packet."""
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+        dpt_index=0,
+    )
+
+    assert decoder._max_dpts == 3
+    assert decoder._full_seed_df is None
+
+
+def test_find_data_offset(sample_file, temp_file):
+    """Tests the find_data_offset method."""
+    assert decode_data.find_data_offset(temp_file) == \
+        sample_file.filesize - sample_file.ndpts * sample_file.packet_length
+    assert decode_data.find_data_offset(temp_file, start_bytes=b"junk") is None
+
+
+def test_detect_packet_length():
+    """Tests the detect_packet_length method finds the length of `sample.unk`."""
+    filepath = os.path.join(os.path.dirname(__file__), "..", "sample.unk")
+
+    actual = decode_data.detect_packet_length(filepath, max_len=40)
+
+    assert actual[0].packet_length == decode_data.PACKET_LENGTH
+    assert actual[0].confidence > 0.5
+    assert actual[1].confidence < actual[0].confidence
+
+
+def test_detect_packet_length__no_header(tmp_path):
+    """Tests detect_packet_length ignores start bytes in a file without a header."""
+    packets = np.random.RandomState(0).randint(0, 256, (200, 9)).astype(np.uint8)
+    packets[:, 0] = decode_data.START_BYTE
+    packets[:, 1] = np.arange(200)
+    # The first packet holds the bytes ending a header.
+    packets[0, 1:3] = [170, 1]
+
+    headerless = os.path.join(tmp_path.as_posix(), "headerless.unk")
+    with open(headerless, "wb") as f:
+        f.write(packets.tobytes())
+
+    with_header = os.path.join(tmp_path.as_posix(), "with_header.unk")
+    with open(with_header, "wb") as f:
+        f.write(packet_map.get_header_bytes("with_header.unk",
+                parse("2020-03-17 10:00:00")) + packets.tobytes())
+
+    assert decode_data.read_header(headerless) == (None, None)
+    assert decode_data.detect_packet_length(headerless) == \
+        decode_data.detect_packet_length(with_header)
+
+
+def test_data_decoder__infer_knowns(sample_decoder):
+    """Tests DataDecoder.infer_knowns finds the counting fields of the sample file."""
+    sample_decoder._knowns = {0: {"dtype": "uint8le", "label": "dpt"}}
+
+    actual = sample_decoder.infer_knowns()
+
+    assert 0 not in actual
+    assert actual[1] == {"dtype": "uint16le", "label": "counter_1"}
+    assert actual[3] == {"dtype": "uint32le", "label": "counter_3"}
+
+
+def test_data_decoder__detect_fields(sample_file, tmp_path):
+    """Tests the DataDecoder detects the dpt field of a file without header."""
+    filepath = os.path.join(tmp_path.as_posix(), "no_header.unk")
+    with open(filepath, "wb") as f:
+        f.write(sample_file.sample_bytes[-sample_file.ndpts * sample_file.packet_length:])
+
+    decoder = decode_data.DataDecoder(
+        filepath=filepath,
+        packet_length=sample_file.packet_length,
+        knowns=None,
+        dpt_index=None,
+    )
+
+    assert decoder._max_dpts == 3
+    assert decoder._dpt_field.byte_idx == 0
+    assert decoder._dpt_field.dtype == "uint8le"
+    assert decoder.decode_byte_idx(byte_idx=3, dtype="uint32le") == [3, 4, 5]
+
+
+def test_read_header(sample_file, temp_file):
+    """Tests the read_header method."""
+    filepath = os.path.join(os.path.dirname(__file__), "..", "sample.unk")
+
+    offset, header = decode_data.read_header(filepath)
+    assert offset == 81
+    assert header == packet_map.Header("Acme v1.0", "sample.unk",
+            parse("2020-03-17 10:00:00"))
+
+    assert decode_data.read_header(temp_file) == (
+        sample_file.filesize - sample_file.ndpts * sample_file.packet_length,
+        packet_map.Header("Acme v1.0", "debug.unk", parse("2020-03-17 10:00:00")),
+    )
+    assert decode_data.read_header(temp_file, start_bytes=b"junk") == (None, None)
+
+    # Start bytes not preceded by a header (e.g. within packets) are ignored.
+    with open(temp_file, "wb") as f:
+        f.write(b"debug.unk \n" + packet_map.START_BYTES + b"\x01\x02\x00\x03")
+
+    assert decode_data.read_header(temp_file) == (None, None)
+
+
+def test_data_decoder__start_bytes_in_packets(tmp_path):
+    """Tests packets containing the start bytes are not taken for a header."""
+    filepath = os.path.join(tmp_path.as_posix(), "no_header.unk")
+    knowns = {0: {"label": "start", "dtype": "uint8le"},
+        1: {"label": "dpt", "dtype": "uint32le"}}
+
+    # Dpt 426 (0x01AA) is laid out as \xaa\xaa\x01\x00\x00.
+    records = np.zeros(30, dtype=lib.get_packet_dtype(knowns, 5))
+    records["start"] = decode_data.START_BYTE
+    records["dpt"] = np.arange(401, 431)
+    records.tofile(filepath)
+
+    decoder = decode_data.DataDecoder(filepath, packet_length=5, knowns=knowns,
+            dpt_index=1)
+
+    assert decoder.header is None
+    assert decoder.data_offset == 0
+    assert decoder.npackets == 30
+    assert decoder.decode_knowns(dpts=30)["dpt"].tolist() == list(range(401, 431))
+
+
+def test_data_decoder__header(sample_file, tmp_path):
+    """Tests the DataDecoder counts packets from the header, not the dpt field."""
+    filepath = os.path.join(tmp_path.as_posix(), "partial.unk")
+    with open(filepath, "wb") as f:
+        # A partial packet at the end of the file is ignored.
+        f.write(sample_file.sample_bytes + b"\x04\x05")
+
+    with pytest.warns(UserWarning):
+        decoder = decode_data.DataDecoder(
+            filepath=filepath,
+            packet_length=sample_file.packet_length,
+            knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+            dpt_index=0,
+        )
+
+    assert decoder.data_offset == sample_file.filesize - 3 * sample_file.packet_length
+    assert decoder.npackets == 3
+    assert decoder._max_dpts == 3
+    assert decoder.decode_byte_idx(label="dpt") == [1, 2, 3]
+
+    with pytest.raises(lib.DecoderRingError):
+        decoder.decode_knowns(dpts=4)
+        assert False, "DecoderRingError should have been raised."
+
+
+@pytest.fixture()
+def corrupt_bytes():
+    """Returns a stream of 10 packets (start byte, uint8 dpt, uint16 value) with
+    bytes dropped from packet 2, 3 garbage bytes before packet 5 and the start
+    byte of packet 7 lost."""
+    packets = [bytes([170, dpt, dpt, 0]) for dpt in range(1, 11)]
+    packets[2] = packets[2][:2]
+    packets[5] = b"\x00\x01\x02" + packets[5]
+    packets[7] = b"\x00" + packets[7][1:]
+
+    return b"".join(packets)
+
+
+def test_locate_packets(corrupt_bytes):
+    """Tests the locate_packets method resynchronizes on corrupt bytes."""
+    data = np.frombuffer(corrupt_bytes, dtype=np.uint8)
+
+    starts, valid, skipped = decode_data.locate_packets(data, 4, confirm=1)
+
+    assert list(starts) == [0, 4, 8, 10, 14, 21, 25, 33, 37]
+    assert list(valid) == [True, True, False, True, True, True, True, True, True]
+    assert skipped == [(18, 21), (29, 33)]
+
+    # The dpt of the truncated packet continues the count, so is only invalid
+    # because the next packet starts before it ends.
+    _, valid, _ = decode_data.locate_packets(data, 4, dpt_index=1,
+            dpt_dtype="uint8le", confirm=1)
+    assert list(valid) == [True, True, False, True, True, True, True, True, True]
+
+
+def test_locate_packets__clean():
+    """Tests the locate_packets method on a clean stream with a partial packet."""
+    data = np.frombuffer(b"\x01\x02" + bytes([170, 1, 2, 170, 2, 3, 170]),
+            dtype=np.uint8)
+
+    starts, valid, skipped = decode_data.locate_packets(data, 3)
+
+    assert list(starts) == [2, 5]
+    assert valid.all()
+    assert skipped == [(0, 2), (8, 9)]
+
+
+def test_gather_packets():
+    """Tests the gather_packets method."""
+    data = np.arange(10, dtype=np.uint8)
+    dtype = np.dtype([("a", "u1"), ("b", "u1")])
+
+    evenly_spaced = decode_data.gather_packets(data, np.array([2, 4, 6]), dtype)
+    assert np.shares_memory(evenly_spaced, data)
+    assert evenly_spaced.tolist() == [(2, 3), (4, 5), (6, 7)]
+
+    assert decode_data.gather_packets(data, np.array([0, 3, 7]), dtype).tolist() == \
+        [(0, 1), (3, 4), (7, 8)]
+
+
+def test_data_decoder__resync_knowns(corrupt_bytes, tmp_path):
+    """Tests DataDecoder.resync_knowns decodes around corrupt bytes."""
+    filepath = os.path.join(tmp_path.as_posix(), "corrupt.unk")
+    with open(filepath, "wb") as f:
+        f.write(packet_map.get_header_bytes("corrupt.unk", parse("2020-03-17 10:00:00")) +
+                corrupt_bytes)
+
+    knowns = {
+        1: {"dtype": "uint8le", "label": "dpt"},
+        2: {"dtype": "uint16le", "label": "val", "factor": 10},
+    }
+    with pytest.warns(UserWarning):
+        decoder = decode_data.DataDecoder(filepath, packet_length=4, knowns=knowns,
+                dpt_index=1)
+
+    actual = decoder.resync_knowns(confirm=1)
+
+    assert actual.data["dpt"].tolist() == [1, 2, 3, 4, 5, 6, 7, 9, 10]
+    assert actual.data["val"][actual.valid].tolist() == \
+        [0.1, 0.2, 0.4, 0.5, 0.6, 0.7, 0.9, 1.0]
+    assert [(start - decoder.data_offset, stop - decoder.data_offset) for start, stop
+            in actual.skipped] == [(18, 21), (29, 33)]
+
+
+@pytest.mark.parametrize("backend", decode_data.BACKENDS)
+def test_data_decoder__resync_knowns_memory(tmp_path, backend):
+    """Tests DataDecoder.resync_knowns memory stays bounded on a large corrupt file."""
+    npackets, packet_length = 100000, 32
+    packets = np.zeros((npackets, packet_length), dtype=np.uint8)
+    packets[:, 0] = 170
+    packets[:, 1:5] = np.arange(npackets, dtype="<u4").view(np.uint8).reshape(-1, 4)
+
+    data = bytearray(packets.tobytes())
+    for dpt in (1000, 50000, 99000):
+        data[dpt * packet_length:dpt * packet_length + 5] = b"\x00\x01\x02\x03\x04"
+
+    filepath = os.path.join(tmp_path.as_posix(), "corrupt.unk")
+    with open(filepath, "wb") as f:
+        f.write(packet_map.get_header_bytes("corrupt.unk", parse("2020-03-17 10:00:00")) +
+                bytes(data))
+
+    knowns = {
+        1: {"dtype": "uint32le", "label": "dpt"},
+        5: {"dtype": "uint8le", "label": "val"},
+    }
+    decoder = decode_data.DataDecoder(filepath, packet_length=packet_length,
+            knowns=knowns, dpt_index=1, backend=backend)
+
+    tracemalloc.start()
+    try:
+        actual = decoder.resync_knowns()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        decoder.close()
+
+    assert len(actual.data) == npackets - 3
+    assert len(actual.skipped) == 3
+    # The gathered packets are about the size of the file; an index per byte
+    # of every packet would be several times larger.
+    assert peak < 3 * len(data)
+
+
+@pytest.mark.parametrize("backend", decode_data.BACKENDS)
+def test_data_decoder__getitem(sample_file, temp_file, backend):
+    """Tests DataDecoder supports indexing and slicing packets by position."""
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+        dpt_index=0,
+        backend=backend,
+    )
+    expected = decoder.decode_knowns()
+
+    assert len(decoder) == 3
+    for key in [slice(None), slice(1, None), slice(None, None, 2),
+            slice(None, None, -1), slice(2, 0, -2), slice(1, 1)]:
+        pd.testing.assert_frame_equal(decoder[key], expected.iloc[key])
+
+    pd.testing.assert_frame_equal(decoder[-1], expected.iloc[[2]])
+    with pytest.raises(IndexError):
+        _ = decoder[3]
+        assert False, "IndexError should have been raised."
+
+
+def test_data_decoder__packets(sample_file, temp_file):
+    """Tests DataDecoder.packets decodes datapoints by number."""
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+        dpt_index=0,
+    )
+
+    actual = decoder.packets(range(3, 0, -2))
+    assert actual.index.tolist() == [3, 1]
+    assert actual["dpt"].tolist() == [3, 1]
+
+    assert decoder.packets((2, 4))["dpt"].tolist() == [2, 3]
+
+    with pytest.raises(lib.DecoderRingError):
+        decoder.packets((0, 2))
+        assert False, "DecoderRingError should have been raised."
+
+
+def test_data_decoder__query_time(sample_file, temp_file):
+    """Tests DataDecoder.query_time returns packets in a time range."""
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "time", "dtype": "uint8le", "factor": 2}},
+        dpt_index=None,
+    )
+
+    # Times are 0.5, 1.0, 1.5
+    assert decoder.query_time(1.0, 1.5)["time"].tolist() == [1.0]
+    assert decoder.query_time(0.7).index.tolist() == [1, 2]
+    assert decoder.query_time(t1=10).index.tolist() == [0, 1, 2]
+    assert decoder.query_time(2, 3).empty
+
+    # Datetimes are relative to the start time in the header.
+    assert decoder.query_time(parse("2020-03-17 10:00:01")).index.tolist() == [1, 2]
+
+    with pytest.raises(lib.DecoderRingError):
+        decoder.query_time(1.0, label="missing")
+        assert False, "DecoderRingError should have been raised."
+
+
+def test_data_decoder__query_time_datetime():
+    """Tests DataDecoder.query_time accepts datetimes relative to the header."""
+    filepath = os.path.join(os.path.dirname(__file__), "..", "sample.unk")
+
+    with decode_data.DataDecoder(filepath, knowns=packet_map.PACKET_MAP,
+            backend="mmap") as decoder:
+        actual = decoder.query_time(parse("2020-03-17 10:00:01"),
+                parse("2020-03-17 10:00:03"))
+
+    assert actual["time"].tolist() == [1.0, 1.5, 2.0, 2.5]
+    assert actual["dpt"].tolist() == [2, 3, 4, 5]
+
+
+def test_decode_knowns__columns(sample_decoder):
+    """Tests DataDecoder.decode_knowns decodes only the requested columns."""
+    sample_decoder._knowns = {
+        0: {"label": "dpt", "dtype": "uint8le"},
+        3: {"label": "cur", "dtype": "uint32le", "factor": 2},
+    }
+
+    actual = sample_decoder.decode_knowns(dpts=3, columns=["cur", "dpt"])
+
+    assert list(actual.columns) == ["cur", "dpt"]
+    assert actual["cur"].tolist() == [1.5, 2.0, 2.5]
+
+    with pytest.raises(lib.DecoderRingError):
+        sample_decoder.decode_knowns(dpts=3, columns=["pot"])
+        assert False, "DecoderRingError should have been raised."
+
+
+def test_decode_fields(sample_decoder):
+    """Tests DataDecoder.decode_fields decodes overlapping fields in one pass."""
+    actual = sample_decoder.decode_fields([(1, "uint16le"), (1, "uint8le", 2),
+            (3, "uint32le")], dpts=2)
+
+    assert list(actual.columns) == ["1-uint16le", "1-uint8le", "3-uint32le"]
+    assert actual["1-uint16le"].tolist() == [3, 4]
+    assert actual["1-uint8le"].tolist() == [1.5, 2.0]
+    assert actual["3-uint32le"].tolist() == [4, 5]
+
+
+def test_decode_knowns__cache(sample_file, temp_file, tmp_path):
+    """Tests DataDecoder.decode_knowns reads cached columns once decoded."""
+    cache_root = os.path.join(tmp_path.as_posix(), "cache")
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+        dpt_index=0,
+        cache=True,
+        cache_root=cache_root,
+    )
+
+    expected = decoder.decode_knowns()
+    assert len(os.listdir(cache_root)) == 1
+
+    # Cached columns are read from now on.
+    decoder._decode_columns = None
+    pd.testing.assert_frame_equal(decoder.decode_knowns(), expected)
+    pd.testing.assert_frame_equal(decoder.decode_knowns(dpts=2), expected.iloc[1:]
+            .reset_index(drop=True))
+
+
+def test_decode_knowns__cache_grown(sample_file, temp_file, tmp_path):
+    """Tests a file grown after the decoder counted its packets is re-cached."""
+    kwargs = dict(packet_length=sample_file.packet_length,
+            knowns={0: {"label": "dpt", "dtype": "uint8le"}}, dpt_index=0, cache=True,
+            cache_root=os.path.join(tmp_path.as_posix(), "cache"))
+    decoder = decode_data.DataDecoder(temp_file, **kwargs)
+
+    with open(temp_file, "ab") as f:
+        f.write(b'\x04\x05\x00\x06\x00\x00\x00')
+
+    assert decoder.decode_knowns()["dpt"].tolist() == [1, 2, 3]
+    assert decode_data.DataDecoder(temp_file, **kwargs).decode_knowns()["dpt"].tolist() \
+        == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("backend, cache", [
+    ("file", False),
+    ("mmap", False),
+    ("file", True),
+])
+def test_data_decoder__refresh(sample_file, temp_file, tmp_path, backend, cache):
+    """Tests DataDecoder.refresh decodes only the packets appended since."""
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"},
+            3: {"label": "cur", "dtype": "uint32le"}},
+        dpt_index=0,
+        backend=backend,
+        cache=cache,
+        cache_root=os.path.join(tmp_path.as_posix(), "cache"),
+    )
+
+    actual = decoder.refresh()
+    assert actual["dpt"].tolist() == [1, 2, 3]
+    assert actual.index.tolist() == [0, 1, 2]
+
+    # A packet and a half are appended; the half is decoded once complete.
+    with open(temp_file, "ab") as f:
+        f.write(b'\x04\x05\x00\x06\x00\x00\x00' b'\x05\x06\x00')
+
+    actual = decoder.refresh()
+    assert actual["cur"].tolist() == [6]
+    assert actual.index.tolist() == [3]
+
+    with open(temp_file, "ab") as f:
+        f.write(b'\x07\x00\x00\x00')
+
+    actual = decoder.refresh()
+    assert actual["dpt"].tolist() == [5]
+    assert actual.index.tolist() == [4]
+    assert decoder.refresh().empty
+
+    assert len(decoder) == 5
+    assert decoder.decode_knowns()["cur"].tolist() == [3, 4, 5, 6, 7]
+
+    # Truncating the file is not supported.
+    with open(temp_file, "r+b") as f:
+        f.truncate(10)
+
+    with pytest.raises(lib.DecoderRingError):
+        decoder.refresh()
+
+    decoder.close()
+
+
+def _record_refreshes(decoder, monkeypatch):
+    """Returns a list to which the number of packets of each refresh of
+    `decoder` is appended."""
+    refreshes = []
+    refresh = decoder.refresh
+
+    def recorded_refresh():
+        new_df = refresh()
+        refreshes.append(len(new_df))
+        return new_df
+
+    monkeypatch.setattr(decoder, "refresh", recorded_refresh)
+
+    return refreshes
+
+
+async def _wait_for_refresh(refreshes, nrefreshes):
+    """Waits until more than `nrefreshes` refreshes are recorded."""
+    while len(refreshes) <= nrefreshes:
+        await asyncio.sleep(0.005)
+
+
+def test_data_decoder__follow(sample_file, temp_file, monkeypatch):
+    """Tests DataDecoder.follow yields packets as they are appended."""
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+        dpt_index=0,
+    )
+    refreshes = _record_refreshes(decoder, monkeypatch)
+
+    def append(packet):
+        with open(temp_file, "ab") as f:
+            f.write(packet)
+
+    # The writer appends once the follower has yielded the previous batch.
+    yielded = [asyncio.Event(), asyncio.Event()]
+
+    async def write():
+        await yielded[0].wait()
+
+        # The first packet is written in two parts; the first is decoded as
+        # no packets.
+        nrefreshes = len(refreshes)
+        append(b'\x04\x05\x00\x06')
+        await _wait_for_refresh(refreshes, nrefreshes)
+        append(b'\x00\x00\x00')
+
+        await yielded[1].wait()
+        append(b'\x05\x06\x00\x07\x00\x00\x00')
+
+    async def follow():
+        writer = asyncio.ensure_future(write())
+        batches = []
+
+        following = decoder.follow(interval=0.005)
+        try:
+            async for new_df in following:
+                batches.append(new_df)
+                if len(batches) == 3:
+                    break
+                yielded[len(batches) - 1].set()
+        finally:
+            await following.aclose()
+
+        await writer
+        return batches
+
+    batches = asyncio.run(follow())
+
+    assert [batch["dpt"].tolist() for batch in batches] == [[1, 2, 3], [4], [5]]
+    assert [batch.index.tolist() for batch in batches[1:]] == [[3], [4]]
+    assert refreshes == [3, 0, 1, 1]
+
+
+def test_data_decoder__follow_idle_timeout(sample_file, temp_file):
+    """Tests DataDecoder.follow stops once no packets are appended."""
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+        dpt_index=0,
+    )
+
+    async def follow():
+        return [new_df async for new_df in decoder.follow(interval=0.005,
+                idle_timeout=0.01)]
+
+    assert [batch["dpt"].tolist() for batch in asyncio.run(follow())] == [[1, 2, 3]]
+
+
+def test_follow_all(sample_file, temp_file, tmp_path, monkeypatch):
+    """Tests follow_all merges the batches of many followed files."""
+    other_file = os.path.join(tmp_path.as_posix(), "other.unk")
+    with open(other_file, "wb") as f:
+        f.write(sample_file.sample_bytes)
+
+    decoders = [decode_data.DataDecoder(
+        filepath=filepath,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+        dpt_index=0,
+    ) for filepath in [temp_file, other_file]]
+    refreshes = [_record_refreshes(decoder, monkeypatch) for decoder in decoders]
+
+    async def start():
+        # Appended once the backlog of both files is skipped.
+        for decoder_refreshes in refreshes:
+            await _wait_for_refresh(decoder_refreshes, 0)
+
+        with open(other_file, "ab") as f:
+            f.write(b'\x04\x05\x00\x06\x00\x00\x00')
+
+    async def follow():
+        batches = []
+
+        following = decode_data.follow_all(decoders, interval=0.005, backlog=False)
+        try:
+            async for decoder, new_df in following:
+                batches.append((decoder._filepath, new_df["dpt"].tolist()))
+                if len(batches) == 2:
+                    break
+
+                with open(temp_file, "ab") as f:
+                    f.write(b'\x05\x06\x00\x07\x00\x00\x00')
+        finally:
+            await following.aclose()
+
+        return batches
+
+    async def main():
+        writer = asyncio.ensure_future(start())
+        batches = await follow()
+        await writer
+        return batches
+
+    assert asyncio.run(main()) == [(other_file, [4]), (temp_file, [5])]
+
+
+def test_data_decoder__follow_does_not_block(sample_file, temp_file, monkeypatch):
+    """Tests DataDecoder.follow refreshes off the event loop."""
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+        dpt_index=0,
+    )
+
+    refresh = decoder.refresh
+    started, released = threading.Event(), threading.Event()
+
+    def blocked_refresh():
+        # Only released by a coroutine of the loop once the refresh started,
+        # so the refresh would never return if it ran on the loop.
+        started.set()
+        assert released.wait(timeout=10)
+        return refresh()
+
+    monkeypatch.setattr(decoder, "refresh", blocked_refresh)
+
+    async def release():
+        while not started.is_set():
+            await asyncio.sleep(0.005)
+        released.set()
+
+    async def main():
+        releaser = asyncio.ensure_future(release())
+        batches = [new_df async for new_df in decoder.follow(interval=0.01,
+                idle_timeout=0.01)]
+        await releaser
+        return batches
+
+    assert [batch["dpt"].tolist() for batch in asyncio.run(main())] == [[1, 2, 3]]
+
+
+def test_decode_many(sample_file, temp_file, tmp_path):
+    """Tests decode_many writes the knowns of each file, isolating failures."""
+    other_file = os.path.join(tmp_path.as_posix(), "other.unk")
+    with open(other_file, "wb") as f:
+        f.write(sample_file.sample_bytes + b'\x04\x05\x00\x06\x00\x00\x00')
+    missing_file = os.path.join(tmp_path.as_posix(), "missing.unk")
+    output_dir = os.path.join(tmp_path.as_posix(), "out")
+
+    results = decode_data.decode_many(
+        [temp_file, other_file, missing_file],
+        output_dir,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"}},
+        packet_length=sample_file.packet_length,
+        workers=2,
+        chunksize=2,
+        dpt_index=0,
+    )
+    results = {result.path: result for result in results}
+
+    assert results[temp_file].npackets == 3
+    assert results[temp_file].error is None
+    assert np.load(results[other_file].output)["dpt"].tolist() == [1, 2, 3, 4]
+    assert results[missing_file].output is None
+    assert results[missing_file].error.startswith("FileNotFoundError")
+
+    with pytest.raises(lib.DecoderRingError):
+        list(decode_data.decode_many([temp_file, temp_file], output_dir))
+
+
+@pytest.mark.parametrize("backend", ["file", "mmap"])
+def test_data_decoder__threads(sample_file, temp_file, backend):
+    """Tests decoding with threads matches decoding with one."""
+    knowns = {0: {"label": "dpt", "dtype": "uint8le"},
+        3: {"label": "cur", "dtype": "uint32le", "factor": 2}}
+    decoders = [decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns=knowns,
+        dpt_index=0,
+        backend=backend,
+        threads=threads,
+    ) for threads in [1, 2, 3]]
+
+    expected = decoders[0].decode_knowns()
+    assert expected["cur"].tolist() == [1.5, 2.0, 2.5]
+
+    for decoder in decoders[1:]:
+        pd.testing.assert_frame_equal(decoder.decode_knowns(), expected)
+        pd.testing.assert_frame_equal(decoder.decode_knowns(dpts=2),
+                expected.iloc[1:].reset_index(drop=True))
+
+    with pytest.raises(lib.DecoderRingError):
+        decode_data.DataDecoder(temp_file, packet_length=sample_file.packet_length,
+                knowns=knowns, dpt_index=0, threads=0)
+
+
+def test_data_decoder__stats(sample_file, temp_file):
+    """Tests DataDecoder.stats matches the decoded knowns, chunk by chunk."""
+    decoder = decode_data.DataDecoder(
+        filepath=temp_file,
+        packet_length=sample_file.packet_length,
+        knowns={0: {"label": "dpt", "dtype": "uint8le"},
+            3: {"label": "cur", "dtype": "uint32le", "factor": 2}},
+        dpt_index=0,
+    )
+
+    actual = decoder.stats(chunk_packets=2)
+
+    assert actual["dpt"].count == 3
+    assert actual["dpt"].transitions == 2
+    assert actual["cur"].mean == 2.0
+    assert (actual["cur"].min, actual["cur"].max) == (1.5, 2.5)
+    assert list(decoder.stats(columns=["cur"], dpts=2)) == ["cur"]
+    assert decoder.stats(columns=["cur"], dpts=2)["cur"].mean == 2.25
@@ -3,6 +3,7 @@ Tests of the encode_data moduel and end-to-end tests.
 """
 import pytest
 import os
+import numpy as np
 import pandas as pd
 from tempfile import NamedTemporaryFile
 
@@ -42,6 +43,175 @@ def test_encode_data(sample_df):
     assert packet[1:5] == b'\x02\x00\x00\x00'
 
 
+def test_encode_data__packet_map(sample_df, monkeypatch):
+    """Test the encode_data method uses the given packet map, in chunks."""
+    tmp = NamedTemporaryFile()
+    monkeypatch.setattr(encode_data, "ENCODE_CHUNK_ROWS", 1)
+
+    encode_data.encode_data(tmp.name, sample_df, encode_data.DT, packet_map={
+        0: {"dtype": "uint16be", "label": "dpt"},
+        # Byte 2 is not in the map.
+        3: {"dtype": "int8le", "label": "cur", "factor": -10},
+    })
+
+    with open(tmp.name, "rb") as f:
+        packets = f.read()[-8:]
+
+    assert packets == b'\x00\x01\x00\xf6' b'\x00\x02\x00\x00'
+
+    with pytest.raises(lib.DecoderRingError):
+        encode_data.encode_data(tmp.name, sample_df, encode_data.DT,
+                packet_map={0: {"dtype": "uint8le", "label": "missing"}})
+
+
+def test_packet_writer(sample_df):
+    """Tests PacketWriter writes the same file as encode_data, batch by batch."""
+    expected, actual = NamedTemporaryFile(), NamedTemporaryFile()
+    df = pd.concat([sample_df] * 3, ignore_index=True)
+    encode_data.encode_data(expected.name, df, encode_data.DT)
+
+    with encode_data.PacketWriter(actual.name, encode_data.DT, flush_rows=4) as writer:
+        # The buffer grows with the packets appended, up to flush_rows.
+        writer.append(df.iloc[:1])
+        assert len(writer._buffer) == 1
+        writer.append({label: df[label].to_numpy()[1:] for label in df})
+        assert len(writer._buffer) == 4
+
+        # Only full buffers are written until flushed.
+        assert lib.get_filesize(actual.name) == lib.get_filesize(expected.name) - 2 * 21
+        writer.flush()
+        assert writer.npackets == 6
+
+    with open(expected.name, "rb") as f:
+        expected_bytes = f.read()
+    with open(actual.name, "rb") as f:
+        actual_bytes = f.read()
+
+    # Headers differ by filename only.
+    assert actual_bytes[-6 * 21:] == expected_bytes[-6 * 21:]
+    assert len(actual_bytes) == len(expected_bytes)
+
+    with pytest.raises(lib.DecoderRingError):
+        writer.append(df)
+
+
+def test_transcode_csv(sample_df, tmp_path):
+    """Tests transcode_csv writes the same packets as encode_data."""
+    csv_file = os.path.join(tmp_path.as_posix(), "sample.csv")
+    expected = os.path.join(tmp_path.as_posix(), "expected.unk")
+    actual = os.path.join(tmp_path.as_posix(), "actual.unk")
+
+    df = pd.concat([sample_df] * 5, ignore_index=True)
+    df.to_csv(csv_file, index=False)
+    encode_data.encode_data(expected, df, encode_data.DT)
+
+    assert encode_data.transcode_csv(csv_file, actual, encode_data.DT,
+            chunk_rows=3) == 10
+
+    with open(expected, "rb") as f:
+        expected_bytes = f.read()
+    with open(actual, "rb") as f:
+        actual_bytes = f.read()
+
+    assert actual_bytes[-10 * 21:] == expected_bytes[-10 * 21:]
+
+    df.drop(columns="pot").to_csv(csv_file, index=False)
+    with pytest.raises(lib.DecoderRingError):
+        encode_data.transcode_csv(csv_file, actual, encode_data.DT)
+
+
+@pytest.fixture()
+def invalid_df(sample_df):
+    """Returns sample_df with a negative, imprecise and NaN value."""
+    df = pd.concat([sample_df] * 2, ignore_index=True)
+    df.loc[1, "pot"] = -1.0
+    df.loc[2, "pot"] = 2.0005
+    df.loc[3, "cur"] = np.nan
+
+    return df
+
+
+def test_packet_writer__validate(sample_df, invalid_df):
+    """Tests PacketWriter checks values fit their data-types."""
+    tmp = NamedTemporaryFile()
+
+    # Values within floating-point error of an integer are rounded to it.
+    sample_df["pot"] = [2.345, 4.001]
+    with encode_data.PacketWriter(tmp.name, encode_data.DT, validate="raise") as writer:
+        writer.append(sample_df)
+        assert writer.issues == []
+
+    with open(tmp.name, "rb") as f:
+        assert f.read()[-4:] == b'\xa1\x0f\x00\x00'
+
+    with pytest.raises(lib.DecoderRingError):
+        encode_data.encode_data(tmp.name, invalid_df, encode_data.DT, validate="raise")
+
+    with pytest.warns(UserWarning):
+        with encode_data.PacketWriter(tmp.name, encode_data.DT, flush_rows=2,
+                validate="report") as writer:
+            writer.append(invalid_df)
+
+    assert writer.issues == [
+        encode_data.EncodingIssue("pot", 1, 1, 1),
+        encode_data.EncodingIssue("cur", 1, 0, 3),
+    ]
+
+    # Rows before the chunk of an error are written and counted.
+    with encode_data.PacketWriter(tmp.name, encode_data.DT, flush_rows=1,
+            validate="raise") as writer:
+        with pytest.raises(lib.DecoderRingError):
+            writer.append(invalid_df)
+
+        assert writer.npackets == 1
+        writer.append(invalid_df.iloc[:1])
+        assert writer.npackets == 2
+    assert lib.get_filesize(tmp.name) == len(packet_map.get_header_bytes(
+            os.path.basename(tmp.name), encode_data.DT)) + 2 * 21
+
+    with pytest.raises(lib.DecoderRingError):
+        encode_data.PacketWriter(tmp.name, encode_data.DT, validate="ignore")
+
+
+def test_check_values():
+    """Tests the _check_values method."""
+    values, overflows, losses = encode_data._check_values(
+        np.array([-1.0, 2.5, 254.9999999999, 300.0, np.nan]), np.dtype("<u1"),
+        clip=True)
+
+    assert values.tolist() == [0, 2, 255, 255, 0]
+    assert overflows.tolist() == [True, False, False, True, True]
+    assert losses.tolist() == [False, True, False, False, False]
+
+    values, overflows, losses = encode_data._check_values(np.array([1e39, -np.inf]),
+            np.dtype("<f4"), clip=True)
+
+    assert values.tolist() == [np.finfo("<f4").max, -np.inf]
+    assert overflows.tolist() == [True, False]
+    assert not losses.any()
+
+
+def test_encode_synthetic_data(tmp_path):
+    """Tests encode_synthetic_data writes the synthetic data, chunk by chunk."""
+    tmp = os.path.join(tmp_path.as_posix(), "synthetic.unk")
+    expected = pd.concat(sample_data.iter_data(4, step_points=6))
+
+    assert encode_data.encode_synthetic_data(tmp, encode_data.DT, 4, step_points=6,
+            chunk_rows=10, validate="raise") == 96
+
+    decoder = decode_data.DataDecoder(tmp, knowns=packet_map.PACKET_MAP)
+    decoded_df = decoder.decode_knowns()
+
+    pd.testing.assert_frame_equal(decoded_df[expected.columns], expected,
+            check_dtype=False)
+
+    # Data which do not fit the packet map are not written at all.
+    too_long = os.path.join(tmp_path.as_posix(), "too_long.unk")
+    with pytest.raises(lib.DecoderRingError):
+        encode_data.encode_synthetic_data(too_long, encode_data.DT, 50000)
+    assert not os.path.exists(too_long)
+
+
 def test_encode_data__end_to_end():
     """Tests that `sample.unk` is the result of encoding `sample.csv`."""
     df = sample_data.create_data()
@@ -0,0 +1,64 @@
+"""
+Tests of the field_stats module.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import field_stats
+
+
+@pytest.fixture()
+def values():
+    """Returns values of a step-like field, offset far from zero."""
+    return 1e9 + np.array([1.0, 1.0, 2.0, 2.0, 2.0, 3.0, 1.0, 1.0, 4.0, 4.0])
+
+
+def test_compute_stats(values):
+    """Tests the compute_stats method."""
+    actual = field_stats.compute_stats(values)
+
+    assert actual.count == 10
+    assert actual.mean == pytest.approx(values.mean())
+    assert actual.min == values.min()
+    assert actual.max == values.max()
+    assert (actual.first, actual.last) == (values[0], values[-1])
+    assert actual.transitions == 4
+
+    assert field_stats.compute_stats(np.array([])) == field_stats.EMPTY_STATS
+    assert field_stats.compute_stats(np.array([np.nan, 1.0, 3.0])).mean == 2.0
+
+
+@pytest.mark.parametrize("splits", [[], [5], [1, 2, 8], [3, 3, 6]])
+def test_merge_stats(values, splits):
+    """Tests the merge_stats method matches the stats of the whole sequence."""
+    expected = field_stats.compute_stats(values)
+    actual = field_stats.merge_stats(*[field_stats.compute_stats(part) for part in
+            np.split(values, splits)])
+
+    assert actual.count == expected.count
+    assert actual.mean == pytest.approx(expected.mean, rel=1e-15)
+    assert actual.m2 == pytest.approx(expected.m2)
+    assert (actual.min, actual.max) == (expected.min, expected.max)
+    assert actual.transitions == expected.transitions
+
+
+def test_get_std(values):
+    """Tests the get_std method."""
+    stats = field_stats.compute_stats(values)
+
+    assert field_stats.get_std(stats) == pytest.approx(np.std(values, ddof=1))
+    assert field_stats.get_std(stats, ddof=0) == pytest.approx(np.std(values))
+    assert np.isnan(field_stats.get_std(field_stats.compute_stats(values[:1])))
+
+
+def test_stats_to_frame(values):
+    """Tests the stats_to_frame method matches pd.DataFrame.describe."""
+    df = pd.DataFrame({"stp": values, "cur": values / 3})
+    actual = field_stats.stats_to_frame({label: field_stats.compute_stats(df[label])
+            for label in df})
+    expected = df.describe().T
+
+    for column in ["count", "mean", "std", "min", "max"]:
+        np.testing.assert_allclose(actual[column], expected[column])
+    assert actual["transitions"].tolist() == [4, 4]
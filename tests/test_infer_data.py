@@ -0,0 +1,100 @@
+"""
+Tests of the infer_data module.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import infer_data, lib, packet_map, sample_data
+
+
+@pytest.fixture()
+def sample_packets():
+    """Returns packets of sample data encoded with `packet_map.PACKET_MAP`."""
+    step_order = [(cyc, step) for cyc in range(1, 21) for step in
+            ["C", "RAC", "D", "RAD"]]
+    df = sample_data.create_data(step_order=step_order, n=10)
+
+    records = np.zeros(len(df), dtype=lib.get_packet_dtype(packet_map.PACKET_MAP, 21))
+    for byte_dict in packet_map.PACKET_MAP.values():
+        records[byte_dict["label"]] = df[byte_dict["label"]] * byte_dict.get("factor", 1)
+
+    return records.view(np.uint8).reshape(len(df), 21)
+
+
+def test_score_fields(sample_packets):
+    """Tests the score_fields method."""
+    actual = infer_data.score_fields(sample_packets, dtypes=["uint32le", "uint32be"],
+            knowns={0: {"dtype": "uint8le"}})
+
+    assert list(actual.columns) == infer_data.SCORE_COLUMNS
+    assert (actual["byte_idx"] >= 1).all()
+    assert (actual["score"].diff().dropna() <= 0).all()
+
+    dpt = actual.set_index(["byte_idx", "dtype"]).loc[(1, "uint32le")]
+    assert dpt["kind"] == "counter"
+    assert dpt["score"] == 1
+    assert dpt["min"] == 1 and dpt["max"] == len(sample_packets)
+
+    # The byte-swapped counter does not carry like a single field.
+    assert actual.set_index(["byte_idx", "dtype"]).loc[(1, "uint32be"), "carry_order"] < 0.1
+
+
+def test_score_fields__too_few_packets(sample_packets):
+    """Tests the score_fields method raises an error for too few packets."""
+    with pytest.raises(lib.DecoderRingError):
+        _ = infer_data.score_fields(sample_packets[:2])
+        assert False, "DecoderRingError should have been raised."
+
+
+def test_suggest_knowns():
+    """Tests the suggest_knowns method skips overlapping and low scoring fields."""
+    scores_df = pd.DataFrame(
+        data=[
+            (1, "uint32le", "counter", 1.0),
+            (1, "uint16le", "counter", 0.9),
+            (5, "uint16le", "enum", 0.8),
+            (7, "uint8le", "signal", 0.1),
+        ],
+        columns=["byte_idx", "dtype", "kind", "score"]
+    )
+
+    assert infer_data.suggest_knowns(scores_df) == {
+        1: {"dtype": "uint32le", "label": "counter_1"},
+        5: {"dtype": "uint16le", "label": "enum_5"},
+    }
+
+
+def test_infer_knowns(sample_packets):
+    """Tests the infer_knowns method recovers the packet map of sample data."""
+    actual = infer_data.infer_knowns(sample_packets,
+            knowns={0: {"dtype": "uint8le"}})
+
+    # The sample current only takes 3 values, so its bytes are ambiguous.
+    for byte_idx in [1, 5, 7, 9, 17]:
+        assert actual[byte_idx]["dtype"] == packet_map.PACKET_MAP[byte_idx]["dtype"]
+    assert actual[1]["label"] == "counter_1"
+    assert actual[9]["label"] == "time_9"
+
+
+def test_detect_dpt_field(sample_packets):
+    """Tests the detect_dpt_field method finds the dpt counter of sample data."""
+    actual = infer_data.detect_dpt_field(sample_packets)
+
+    assert actual == infer_data.DetectedField(byte_idx=1, dtype="uint32le",
+            first=1, last=len(sample_packets), stride=1)
+
+    # Wider types passing because of constant bytes are too large to be counts.
+    assert infer_data.detect_dpt_field(sample_packets[:, :6]).dtype == "uint32le"
+    assert infer_data.detect_dpt_field(sample_packets,
+            knowns={1: {"dtype": "uint32le"}}) is None
+
+
+def test_detect_time_field(sample_packets):
+    """Tests the detect_time_field method finds the time field of sample data."""
+    actual = infer_data.detect_time_field(sample_packets,
+            knowns={1: {"dtype": "uint32le"}})
+
+    assert actual == infer_data.DetectedField(byte_idx=9, dtype="uint32le",
+            first=5000, last=5000 * len(sample_packets), stride=5000)
+    assert infer_data.detect_time_field(sample_packets[:1]) is None
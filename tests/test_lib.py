@@ -112,3 +112,44 @@ def test_cast_to_bytes__bad_dtype():
     with pytest.raises(lib.DecoderRingError):
         _ = lib.cast_to_bytes(None, "junk")
         assert False, "DecoderRingError should have been raised."
+
+
+def test_get_packet_dtype():
+    """Tests the get_packet_dtype method."""
+    actual = lib.get_packet_dtype(
+        {
+            0: {"dtype": "uint8le", "label": "start"},
+            3: {"dtype": "int16be", "label": "cur"},
+        },
+        7
+    )
+
+    assert actual.names == ("start", "cur")
+    assert actual.fields["cur"] == (np.dtype(">i2"), 3)
+    assert actual.itemsize == 7
+
+
+def test_get_fields_dtype():
+    """Tests the get_fields_dtype method allows overlapping fields."""
+    actual = lib.get_fields_dtype([("a", 1, "uint16le"), ("b", 1, "uint8le")], 7)
+
+    assert actual.itemsize == 7
+    assert actual.fields["a"] == (np.dtype("<u2"), 1)
+    assert actual.fields["b"] == (np.dtype("u1"), 1)
+
+
+def test_get_packet_dtype__does_not_fit():
+    """Tests the get_packet_dtype method raises an error when a known overruns the packet."""
+    with pytest.raises(lib.DecoderRingError):
+        _ = lib.get_packet_dtype({6: {"dtype": "uint16le", "label": "cur"}}, 7)
+        assert False, "DecoderRingError should have been raised."
+
+
+def test_cast_offsets():
+    """Tests the cast_offsets method."""
+    packets = np.array([[1, 2, 0], [3, 4, 0]], dtype=np.uint8)
+
+    values, valid = lib.cast_offsets(packets, "uint16le")
+
+    assert (values == np.array([[513, 2, 0], [1027, 4, 0]])).all()
+    assert (valid == np.array([True, True, False])).all()
@@ -7,6 +7,7 @@ from collections import namedtuple
 from textwrap import dedent
 
 from src import packet_map
+from src.lib import DecoderRingError
 
 DT_STR = "2020-03-17 10:00:00"
 
@@ -55,3 +56,25 @@ def test_get_header_bytes(expected_header):
         start_bytes=packet_map.START_BYTES,
         version_string=expected_header.version_string
     ) == expected_header.header_bytes
+
+
+def test_parse_header_bytes(expected_header):
+    """Test the parse_header_bytes method."""
+    assert packet_map.parse_header_bytes(expected_header.header_bytes) == \
+        packet_map.Header(
+            expected_header.version_string,
+            expected_header.filename,
+            expected_header.start_time
+        )
+
+
+@pytest.mark.parametrize("header_bytes", [
+    b"debug.unk \n\xaa\xaa\x01",
+    b"ABC 123\ndummy.unk\nyesterday\n\xaa\xaa\x01",
+    b"\xff\xfe\n\n\n",
+])
+def test_parse_header_bytes__invalid(header_bytes):
+    """Test the parse_header_bytes method raises an error for invalid headers."""
+    with pytest.raises(DecoderRingError):
+        _ = packet_map.parse_header_bytes(header_bytes)
+        assert False, "DecoderRingError should have been raised."
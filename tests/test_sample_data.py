@@ -159,3 +159,55 @@ def test_create_data(small_sample_conditions, small_sample_data):
     )
 
     assert (actual == small_sample_data).all().all()
+
+
+def test_iter_data(small_sample_conditions):
+    """Tests the iter_data method matches create_data without noise."""
+    expected = sample_data.create_data(
+        step_order=[(1, 'C'), (1, 'RAC'), (1, 'D'), (1, 'RAD'), (2, 'C')],
+        n=small_sample_conditions.n,
+    )
+
+    actual = pd.concat(sample_data.iter_data(
+        2,
+        step_points=small_sample_conditions.n,
+        chunk_rows=5,
+        cur_noise=0,
+        pot_noise=0,
+        time_jitter=0,
+    ))
+
+    assert len(actual) == 24
+    assert actual.index.tolist() == list(range(24))
+    pd.testing.assert_frame_equal(actual[expected.columns].iloc[:15], expected)
+
+
+def test_iter_data__noise(monkeypatch):
+    """Tests the iter_data method is deterministic whatever the chunk size."""
+    monkeypatch.setattr(sample_data, "NOISE_BLOCK_ROWS", 7)
+    step_points = {'C': 10, 'RAC': 2, 'D': 10, 'RAD': 3}
+
+    expected = pd.concat(sample_data.iter_data(3, step_points=step_points, seed=1))
+    actual = pd.concat(sample_data.iter_data(3, step_points=step_points, seed=1,
+            chunk_rows=4))
+
+    pd.testing.assert_frame_equal(actual, expected)
+    assert not expected.equals(pd.concat(sample_data.iter_data(3,
+            step_points=step_points, seed=2)))
+
+    assert (np.diff(expected["time"]) > 0).all()
+    assert expected["stp"].tolist()[:13] == [1] * 10 + [2] * 2 + [3]
+    assert expected.loc[expected["stp"] == 1, "cur"].between(0.99, 1.01).all()
+
+    # Arguments are checked when called, not when iterated.
+    with pytest.raises(sample_data.DecoderRingError):
+        sample_data.iter_data(1, time_jitter=sample_data.DT)
+
+    # The default jitter scales with dt.
+    short_dt = pd.concat(sample_data.iter_data(3, step_points=step_points, dt=0.001))
+    assert (np.diff(short_dt["time"]) > 0).all()
+
+    # The time of 10^6 rows at the default dt does not fit the packet map.
+    with pytest.raises(sample_data.DecoderRingError):
+        sample_data.iter_data(50000)
+    sample_data.iter_data(50000, dt=0.1)